@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Recognition Benchmark for the Facial Recognition Attendance System
+
+Times detection, feature extraction, matching and the database calls
+separately on synthetic frames and galleries, so throughput can be
+compared between versions without a camera.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --gallery-sizes 10,1000,100000 --iterations 200
+    python benchmark.py --recognizer both --export results.json
+    python benchmark.py --gallery-sizes 1000,50000 --ann-report
+    python benchmark.py --detectors haar,lbp,ssd,yunet --detection-scale 0.5
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+from src.database import Database
+from src.encoding_index import recall_report
+from src.face_detectors import make_detector
+from src.simple_face_recognition import SimpleFaceRecognizer
+
+
+def percentile_summary(stage, gallery_size, timings_ms, items_per_call=1):
+    """Summarise a list of per-call timings in milliseconds"""
+    timings = np.asarray(timings_ms, dtype=np.float64)
+    mean_ms = float(timings.mean())
+    return {
+        'stage': stage,
+        'gallery_size': gallery_size,
+        'calls': int(timings.size),
+        'mean_ms': mean_ms,
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'per_sec': (1000.0 * items_per_call / mean_ms) if mean_ms > 0 else float('inf'),
+    }
+
+
+def time_calls(function, iterations, warmup=3):
+    """Run function repeatedly and return per-call timings in milliseconds"""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def make_face(rng, identity_seed, size=120, noise=12):
+    """Draw a synthetic grayscale face; the same identity_seed gives the same person"""
+    person = np.random.default_rng(identity_seed)
+    face = np.full((size, size), person.integers(90, 200), dtype=np.uint8)
+    center = (size // 2, size // 2)
+    cv2.ellipse(face, center, (int(size * 0.38), int(size * 0.48)), 0, 0, 360,
+                int(person.integers(120, 230)), -1)
+    eye_y = int(size * person.uniform(0.35, 0.45))
+    eye_dx = int(size * person.uniform(0.15, 0.22))
+    eye_r = int(size * person.uniform(0.04, 0.08))
+    for dx in (-eye_dx, eye_dx):
+        cv2.circle(face, (center[0] + dx, eye_y), eye_r, int(person.integers(10, 70)), -1)
+    mouth_y = int(size * person.uniform(0.68, 0.78))
+    cv2.ellipse(face, (center[0], mouth_y), (int(size * person.uniform(0.1, 0.2)), int(size * 0.05)),
+                0, 0, 180, int(person.integers(30, 100)), 2)
+    jitter = rng.normal(0, noise, face.shape)
+    return np.clip(face.astype(np.float32) + jitter, 0, 255).astype(np.uint8)
+
+
+def make_frame(rng, identities, width=640, height=480):
+    """Compose a BGR frame containing one synthetic face per identity"""
+    frame = rng.integers(0, 60, (height, width), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (9, 9), 0)
+    slot_width = width // max(1, len(identities))
+    for i, identity in enumerate(identities):
+        face = make_face(rng, identity, size=min(160, slot_width - 10))
+        x = i * slot_width + (slot_width - face.shape[1]) // 2
+        y = (height - face.shape[0]) // 2
+        frame[y:y+face.shape[0], x:x+face.shape[1]] = face
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+
+
+def synthetic_gallery(recognizer, rng, size, enrolled_faces=256):
+    """
+    Names and features for a gallery of the requested size. Real synthetic
+    faces are enrolled for the first identities; the rest are perturbed
+    copies so huge galleries build quickly.
+    """
+    base = np.stack([recognizer.extract_face_features(make_face(rng, identity))
+                     for identity in range(min(size, enrolled_faces))])
+    if size > base.shape[0]:
+        picks = rng.integers(0, base.shape[0], size - base.shape[0])
+        extra = base[picks] * rng.uniform(0.8, 1.2, (picks.size, base.shape[1])).astype(np.float32)
+        base = np.vstack([base, extra])
+    names = [f"Employee {i:06d}" for i in range(size)]
+    return names, base
+
+
+def bench_simple(args, rng, work_dir):
+    """SimpleFaceRecognizer: detection, features, matching and end-to-end recognition"""
+    results = []
+    recognizer = SimpleFaceRecognizer(model_path=os.path.join(work_dir, "templates"),
+                                      legacy_model_path=None, feature_cache_path=None,
+                                      detection_scale=args.detection_scale, feature_type=args.feature_type)
+
+    frames = [make_frame(rng, rng.integers(0, 256, args.faces_per_frame)) for _ in range(16)]
+    grays = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+    rois = [make_face(rng, identity) for identity in rng.integers(0, 256, 64)]
+
+    cycle = {'i': 0}
+
+    def next_index(n):
+        cycle['i'] = (cycle['i'] + 1) % n
+        return cycle['i']
+
+    timings = time_calls(lambda: recognizer.detect_faces(grays[next_index(len(grays))]), args.iterations)
+    results.append(percentile_summary('simple/detection', None, timings))
+
+    timings = time_calls(lambda: recognizer.extract_face_features(rois[next_index(len(rois))]), args.iterations)
+    results.append(percentile_summary('simple/features', None, timings))
+
+    probes = np.stack([recognizer.extract_face_features(roi) for roi in rois[:args.faces_per_frame]])
+    for size in args.gallery_sizes:
+        names, features = synthetic_gallery(recognizer, rng, size)
+        recognizer.gallery.build(names, features)
+
+        timings = time_calls(lambda: recognizer.gallery.match(probes, recognizer.match_threshold), args.iterations)
+        results.append(percentile_summary('simple/matching', size, timings, args.faces_per_frame))
+
+        timings = time_calls(lambda: recognizer.recognize_faces_in_frame(frames[next_index(len(frames))]),
+                             args.iterations)
+        results.append(percentile_summary('simple/frame', size, timings))
+    return results
+
+
+def bench_detectors(args, rng):
+    """Each requested detection backend on the same frames, at the benchmark's detection scale"""
+    results = []
+    frames = [make_frame(rng, rng.integers(0, 256, args.faces_per_frame)) for _ in range(16)]
+    if args.detection_scale != 1.0:
+        frames = [cv2.resize(frame, (0, 0), fx=args.detection_scale, fy=args.detection_scale,
+                             interpolation=cv2.INTER_AREA) for frame in frames]
+
+    for name in args.detectors:
+        try:
+            detector = make_detector(name)
+        except (ImportError, OSError, ValueError) as e:
+            print(f"Skipping {name} detector: {e}")
+            continue
+        cycle = itertools.count()
+        timings = time_calls(lambda: detector.detect(frames[next(cycle) % len(frames)]), args.iterations)
+        results.append(percentile_summary(f'detector/{name}', None, timings))
+    return results
+
+
+def bench_advanced(args, rng, work_dir):
+    """FaceRecognizer (dlib): detection plus encoding, and matching against 128-d galleries"""
+    try:
+        import face_recognition
+        from src.face_recognition_system import FaceRecognizer
+    except ImportError as e:
+        print(f"Skipping FaceRecognizer benchmark: {e}")
+        return []
+
+    results = []
+    recognizer = FaceRecognizer(model_path=os.path.join(work_dir, "encodings"), legacy_model_path=None)
+
+    frame = make_frame(rng, rng.integers(0, 256, args.faces_per_frame))
+    rgb_small = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=0.25, fy=0.25), cv2.COLOR_BGR2RGB)
+    timings = time_calls(lambda: face_recognition.face_locations(rgb_small), max(10, args.iterations // 10))
+    results.append(percentile_summary('advanced/detection', None, timings))
+
+    locations = face_recognition.face_locations(rgb_small) or [(0, rgb_small.shape[1], rgb_small.shape[0], 0)]
+    timings = time_calls(lambda: face_recognition.face_encodings(rgb_small, locations), max(10, args.iterations // 10))
+    results.append(percentile_summary('advanced/encoding', None, timings, len(locations)))
+
+    probes = rng.normal(0, 0.1, (args.faces_per_frame, 128)).astype(np.float32)
+    for size in args.gallery_sizes:
+        gallery = rng.normal(0, 0.1, (size, 128)).astype(np.float32)
+        recognizer.known_face_encodings = list(gallery)
+        recognizer.known_face_names = [f"Employee {i:06d}" for i in range(size)]
+        recognizer.rebuild_index()
+
+        timings = time_calls(lambda: recognizer.match_encodings(probes), args.iterations)
+        results.append(percentile_summary('advanced/matching', size, timings, args.faces_per_frame))
+    return results
+
+
+def ann_report(args, rng):
+    """Recall and latency of the IVF encoding index against exact search"""
+    print("\nIVF index recall vs latency (clustered synthetic 128-d encodings)")
+    print(f"{'gallery':>9}{'lists':>7}{'n_probe':>9}{'recall@1':>10}{'ivf ms/q':>10}{'exact ms/q':>12}")
+    for size in args.gallery_sizes:
+        people = max(1, size // 5)
+        centers = rng.normal(0, 0.3, (people, 128)).astype(np.float32)
+        owners = rng.integers(0, people, size)
+        gallery = centers[owners] + rng.normal(0, 0.05, (size, 128)).astype(np.float32)
+        queries = gallery[rng.integers(0, size, 100)] + rng.normal(0, 0.03, (100, 128)).astype(np.float32)
+        names = [f"Employee {i:06d}" for i in owners]
+        for row in recall_report(names, gallery, queries, k=1):
+            print(f"{size:>9}{row['n_lists']:>7}{row['n_probe']:>9}{row['recall@1']:>10.3f}"
+                  f"{row['ivf_ms_per_query']:>10.3f}{row['exact_ms_per_query']:>12.3f}")
+
+
+def bench_database(args, work_dir):
+    """Status lookups, single check-ins and batched check-ins on a scratch database"""
+    results = []
+    db = Database(os.path.join(work_dir, "bench.db"))
+    names = [f"Employee {i:06d}" for i in range(args.iterations * 2)]
+    for name in names[:50]:
+        db.add_employee(name)
+
+    counter = {'i': 0}
+
+    def next_name():
+        counter['i'] += 1
+        return names[counter['i'] % len(names)]
+
+    timings = time_calls(lambda: db.get_employee_status(next_name()), args.iterations)
+    results.append(percentile_summary('db/get_employee_status', None, timings))
+
+    timings = time_calls(lambda: db.mark_attendance(next_name()), args.iterations)
+    results.append(percentile_summary('db/mark_attendance', None, timings))
+
+    batch = 32
+
+    def batched_check_ins():
+        futures = [db.submit_attendance(next_name()) for _ in range(batch)]
+        for future in futures:
+            future.result()
+
+    timings = time_calls(batched_check_ins, max(5, args.iterations // batch))
+    results.append(percentile_summary('db/submit_attendance_x32', None, timings, batch))
+
+    db.close()
+    return results
+
+
+def print_results(results):
+    print(f"{'stage':<28}{'gallery':>9}{'calls':>7}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'items/s':>12}")
+    print("-" * 86)
+    for row in results:
+        gallery = "-" if row['gallery_size'] is None else str(row['gallery_size'])
+        print(f"{row['stage']:<28}{gallery:>9}{row['calls']:>7}{row['mean_ms']:>10.3f}"
+              f"{row['p50_ms']:>10.3f}{row['p99_ms']:>10.3f}{row['per_sec']:>12.1f}")
+
+
+def export_results(results, path):
+    """Write results as JSON or CSV depending on the file extension"""
+    if path.lower().endswith(".csv"):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+    else:
+        with open(path, 'w') as f:
+            json.dump({'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+                       'python': sys.version.split()[0],
+                       'opencv': cv2.__version__,
+                       'results': results}, f, indent=2)
+    print(f"Results exported to {path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark face recognition without a camera")
+    parser.add_argument("--gallery-sizes", default="10,1000,10000",
+                        help="comma-separated gallery sizes (default: 10,1000,10000)")
+    parser.add_argument("--iterations", type=int, default=100, help="timed calls per stage")
+    parser.add_argument("--faces-per-frame", type=int, default=2, help="synthetic faces in each frame")
+    parser.add_argument("--detection-scale", type=float, default=1.0,
+                        help="resolution SimpleFaceRecognizer detects at (default: 1.0)")
+    parser.add_argument("--recognizer", choices=["simple", "advanced", "both"], default="simple")
+    parser.add_argument("--feature-type", choices=["histogram", "lbp"], default="histogram",
+                        help="SimpleFaceRecognizer feature type (default: histogram)")
+    parser.add_argument("--detectors", default="",
+                        help="comma-separated detection backends to compare, e.g. haar,lbp,ssd,yunet,hog")
+    parser.add_argument("--ann-report", action="store_true",
+                        help="report IVF index recall vs latency for each gallery size")
+    parser.add_argument("--skip-db", action="store_true", help="skip the database benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--export", help="write results to a .json or .csv file")
+    args = parser.parse_args(argv)
+    args.gallery_sizes = [int(size) for size in args.gallery_sizes.split(",") if size]
+    args.detectors = [name for name in args.detectors.split(",") if name]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    cv2.setRNGSeed(args.seed)
+
+    work_dir = tempfile.mkdtemp(prefix="attendance_bench_")
+    results = []
+    try:
+        if args.recognizer in ("simple", "both"):
+            results += bench_simple(args, rng, work_dir)
+        if args.recognizer in ("advanced", "both"):
+            results += bench_advanced(args, rng, work_dir)
+        if args.detectors:
+            results += bench_detectors(args, rng)
+        if not args.skip_db:
+            results += bench_database(args, work_dir)
+        if args.ann_report:
+            ann_report(args, rng)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print_results(results)
+    if args.export and results:
+        export_results(results, args.export)
+
+
+if __name__ == "__main__":
+    main()
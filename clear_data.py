@@ -76,6 +76,7 @@ def clear_face_templates():
     """Clear face recognition templates"""
     template_path = "models/face_encodings.pkl"
     simple_template_path = "models/face_templates.pkl"
+    template_store_dirs = ["models/templates", "models/encodings", "models/feature_cache"]
     
     cleared_files = []
     
@@ -89,6 +90,16 @@ def clear_face_templates():
                 print(f"❌ Error removing {file_path}: {e}")
                 return False
     
+    for store_dir in template_store_dirs:
+        if os.path.exists(store_dir):
+            try:
+                shutil.rmtree(store_dir)
+                cleared_files.append(store_dir)
+                print(f"✓ Removed template store: {store_dir}")
+            except Exception as e:
+                print(f"❌ Error removing {store_dir}: {e}")
+                return False
+    
     if cleared_files:
         print("✓ Face templates cleared successfully")
     else:
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Bulk Enrollment for the Facial Recognition Attendance System
+
+Enrolls every person found under a directory in one run: either the
+data/faces/<name>/ tree written by the registration apps, or a flat
+photo dump named after the employees ("Jane Doe.jpg", "Jane Doe_2.jpg").
+Images are processed in parallel and people whose photos have not
+changed since the last run are skipped.
+
+Usage:
+    python enroll.py
+    python enroll.py /path/to/hr_photos --add-employees
+    python enroll.py data/faces --recognizer advanced --workers 8 --force
+    python enroll.py --rebuild-stale --feature-type lbp
+"""
+
+import argparse
+import sys
+
+from src.bulk_enrollment import bulk_enroll
+from src.database import Database
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Enroll every face image under a directory")
+    parser.add_argument("root", nargs="?", default="data/faces",
+                        help="directory of <name>/ folders or named photos (default: data/faces)")
+    parser.add_argument("--recognizer", choices=["simple", "advanced"], default="simple")
+    parser.add_argument("--model-path", help="template store directory (default: the recognizer's)")
+    parser.add_argument("--detector", choices=["haar", "lbp", "hog", "ssd", "yunet"],
+                        help="face detection backend (default: the recognizer's)")
+    parser.add_argument("--feature-type", choices=["histogram", "lbp"],
+                        help="template features of the simple recognizer (default: histogram)")
+    parser.add_argument("--rebuild-stale", action="store_true",
+                        help="add templates of this feature type for people who only have templates of "
+                             "another one, from their photos under root")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="re-enroll people whose photos are unchanged")
+    parser.add_argument("--add-employees", action="store_true",
+                        help="also add newly enrolled people to the employee database")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    return parser.parse_args(argv)
+
+
+def make_recognizer(args):
+    kwargs = {'model_path': args.model_path} if args.model_path else {}
+    if args.detector:
+        kwargs['detector'] = args.detector
+    if args.recognizer == "advanced":
+        from src.face_recognition_system import FaceRecognizer
+        return FaceRecognizer(**kwargs)
+    from src.simple_face_recognition import SimpleFaceRecognizer
+    if args.feature_type:
+        kwargs['feature_type'] = args.feature_type
+    return SimpleFaceRecognizer(faces_dir=args.root, **kwargs)
+
+
+def print_progress(done, total, path, message):
+    status = "" if message == "ok" else f" - {message}"
+    print(f"[{done}/{total}] {path}{status}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    recognizer = make_recognizer(args)
+    if args.rebuild_stale:
+        if not getattr(recognizer, 'stale_names', None):
+            print("No templates need rebuilding")
+            return 0
+        missing = recognizer.rebuild_stale_templates()
+        return 1 if missing else 0
+
+    report = bulk_enroll(recognizer, args.root, workers=args.workers, force=args.force,
+                         progress=None if args.quiet else print_progress)
+    print(report.summary())
+    for path, reason in report.failed:
+        print(f"  failed: {path}: {reason}")
+
+    if args.add_employees and report.enrolled:
+        db = Database()
+        added = [name for name in report.enrolled if db.add_employee(name) is not None]
+        db.close()
+        print(f"Added {len(added)} new employees to the database")
+
+    return 0 if report.enrolled or report.unchanged else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
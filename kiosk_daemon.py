@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Headless Kiosk Daemon for the Facial Recognition Attendance System
+
+Runs attendance recognition without a display, for door controllers and
+other kiosks with no screen. Events are logged to stderr and, optionally,
+a log file.
+
+Usage:
+    python kiosk_daemon.py                      # camera 0
+    python kiosk_daemon.py --source rtsp://door-1.local/stream --reconnect
+    python kiosk_daemon.py --source entrance.mp4 --log-file kiosk.log
+    python kiosk_daemon.py --source 0 --source rtsp://door-2.local/stream --workers 4
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import cv2
+
+from src.database import Database
+from src.kiosk_service import KioskService, open_source
+from src.multi_camera import MultiCameraService
+from src.simple_face_recognition import SimpleFaceRecognizer, face_size_range
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless attendance kiosk")
+    parser.add_argument("--source", action="append",
+                        help="camera index, RTSP/HTTP URL or video file; repeat for several cameras (default: 0)")
+    parser.add_argument("--reconnect", action="store_true", help="reopen the source when it drops (single camera)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="recognition worker processes shared by all cameras (default: CPU count)")
+    parser.add_argument("--db", default="data/attendance.db", help="attendance database path")
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--cooldown", type=float, default=15.0, help="seconds between actions for one person")
+    parser.add_argument("--check-out-cooldown", type=float, default=None,
+                        help="seconds after a person's last action before a time-out (default: --cooldown)")
+    parser.add_argument("--min-votes", type=int, default=2,
+                        help="recognitions of the last --vote-window that must agree before a face counts (default: 2)")
+    parser.add_argument("--vote-window", type=int, default=3, help="recognitions voted over per face (default: 3)")
+    parser.add_argument("--detection-scale", type=float, default=0.5)
+    parser.add_argument("--idle-fps", type=float, default=1.0,
+                        help="frames recognised per second while nothing moves (default: 1, 0 recognises every frame)")
+    parser.add_argument("--active-fps", type=float, default=None,
+                        help="frames recognised per second on motion or faces (default: every frame)")
+    parser.add_argument("--motion-threshold", type=int, default=15,
+                        help="grey-level change that counts a pixel as moving (default: 15)")
+    parser.add_argument("--stats-interval", type=float, default=30.0, help="seconds between throughput reports")
+    parser.add_argument("--log-file", help="also append the log to this file")
+    parser.add_argument("--verbose", action="store_true", help="log debug messages")
+    args = parser.parse_args(argv)
+    args.source = args.source or ["0"]
+    return args
+
+
+def configure_logging(args):
+    handlers = [logging.StreamHandler()]
+    if args.log_file:
+        handlers.append(logging.FileHandler(args.log_file, encoding='utf-8'))
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s", handlers=handlers)
+
+
+def probe_frame_width(source, default: int = 640) -> int:
+    """Frame width reported by a video source, or default if it cannot be opened yet"""
+    try:
+        capture = open_source(source, pace_files=False)
+    except IOError as e:
+        logging.getLogger("attendance.kiosk").warning("%s; assuming %dpx-wide frames", e, default)
+        return default
+    try:
+        return int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or default
+    finally:
+        capture.release()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(args)
+
+    db = Database(args.db)
+    # Only look for faces 0.3-2 m away, across every source's frame width
+    ranges = [face_size_range(probe_frame_width(source), 60, 0.3, 2.0) for source in args.source]
+    min_face = min(low for low, _ in ranges)
+    max_face = max(high for _, high in ranges)
+    recognizer_kwargs = {'detection_scale': args.detection_scale,
+                         'min_face_size': min_face, 'max_face_size': max_face}
+    recognizer = SimpleFaceRecognizer(**recognizer_kwargs)
+    governor_options = {'idle_fps': args.idle_fps or 1.0, 'active_fps': args.active_fps,
+                        'motion_threshold': args.motion_threshold}
+    multi_camera = len(args.source) > 1 or args.workers is not None
+    if multi_camera:
+        service = MultiCameraService(recognizer, db, args.source, workers=args.workers,
+                                     recognizer_kwargs=recognizer_kwargs,
+                                     min_confidence=args.min_confidence, cooldown=args.cooldown,
+                                     check_out_cooldown=args.check_out_cooldown,
+                                     min_votes=args.min_votes, vote_window=args.vote_window,
+                                     governor=args.idle_fps > 0, governor_options=governor_options)
+    else:
+        service = KioskService(recognizer, db, min_confidence=args.min_confidence, cooldown=args.cooldown,
+                               check_out_cooldown=args.check_out_cooldown,
+                               min_votes=args.min_votes, vote_window=args.vote_window,
+                               governor=args.idle_fps > 0, governor_options=governor_options)
+
+    def shutdown(signum, frame):
+        logging.getLogger("attendance.kiosk").info("Received signal %d, stopping", signum)
+        service.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        if multi_camera:
+            service.run(stats_interval=args.stats_interval)
+        else:
+            service.run(args.source[0], reconnect=args.reconnect, stats_interval=args.stats_interval)
+    except IOError as e:
+        logging.getLogger("attendance.kiosk").error("%s", e)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -74,6 +74,14 @@ def clear_all_data():
             except Exception as e:
                 print(f"Error removing {template_file}: {e}")
     
+    for store_dir in ["models/templates", "models/encodings", "models/feature_cache"]:
+        if os.path.exists(store_dir):
+            try:
+                shutil.rmtree(store_dir)
+                print(f"✓ Removed {store_dir}")
+            except Exception as e:
+                print(f"Error removing {store_dir}: {e}")
+    
     print("\n✅ CLEANUP COMPLETED!")
     print("All employee records, attendance data, pictures, and face templates have been cleared.")
     if 'backup_dir' in locals():
@@ -0,0 +1,273 @@
+"""
+Facial Recognition Attendance System - Batch Recognition Module
+Author: Uzman Jawaid
+Description: Offline recognition of recorded video and image folders
+Version: 2.0
+Date: August 2025
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+import cv2
+
+from src.bulk_enrollment import IMAGE_EXTENSIONS
+from src.identity_voting import IdentityVoter
+from src.recognition_workers import init_worker, recognize
+
+_END_OF_FRAMES = object()
+
+
+class RecognitionEvent:
+    """One recognised face in one frame of a recording"""
+
+    def __init__(self, source: str, frame_index: int, timestamp: datetime, name: str,
+                 confidence: float, box: Tuple[int, int, int, int], confirmed: bool = True):
+        self.source = source
+        self.frame_index = frame_index
+        self.timestamp = timestamp
+        self.name = name
+        self.confidence = confidence
+        self.box = box  # (top, right, bottom, left)
+        # Whether enough recent frames agree on this identity for it to count as attendance
+        self.confirmed = confirmed
+
+    def as_dict(self) -> dict:
+        return {
+            'source': self.source,
+            'frame': self.frame_index,
+            'timestamp': self.timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+            'name': self.name,
+            'confidence': round(float(self.confidence), 4),
+            'box': [int(v) for v in self.box],
+            'confirmed': self.confirmed,
+        }
+
+
+def iter_video_frames(path: str, start_time: Optional[datetime] = None,
+                      sample_fps: Optional[float] = None) -> Iterator[Tuple[int, datetime, object]]:
+    """
+    Decode a video file, yielding (frame_index, timestamp, frame).
+    Timestamps are start_time plus the frame's position in the video; without
+    start_time the recording is assumed to have ended at the file's mtime.
+    With sample_fps only that many frames per second of video are yielded.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video {path}")
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        if start_time is None:
+            duration = capture.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+            start_time = datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+        step = max(1, int(round(fps / sample_fps))) if sample_fps else 1
+
+        index = 0
+        while True:
+            # grab() skips decoding the frames that are not sampled
+            if not capture.grab():
+                break
+            if index % step == 0:
+                ret, frame = capture.retrieve()
+                if not ret:
+                    break
+                yield index, start_time + timedelta(seconds=index / fps), frame
+            index += 1
+    finally:
+        capture.release()
+
+
+def iter_image_frames(directory: str) -> Iterator[Tuple[int, datetime, object]]:
+    """Yield (index, timestamp, frame) for the images in a directory, in name order, stamped with their mtime"""
+    files = sorted(f for f in os.listdir(directory) if f.lower().endswith(IMAGE_EXTENSIONS))
+    for index, filename in enumerate(files):
+        path = os.path.join(directory, filename)
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+        yield index, datetime.fromtimestamp(os.path.getmtime(path)), frame
+
+
+def iter_frames(source: str, start_time: Optional[datetime] = None,
+                sample_fps: Optional[float] = None) -> Iterator[Tuple[int, datetime, object]]:
+    """Frames of a video file or an image directory"""
+    if os.path.isdir(source):
+        return iter_image_frames(source)
+    return iter_video_frames(source, start_time, sample_fps)
+
+
+def _attach_templates(recognizer, templates) -> None:
+    recognizer.attach_templates(*templates)
+
+
+class BatchRecognizer:
+    """
+    Recognizes every frame of a recording with no GUI.
+
+    A background thread decodes frames into a bounded queue while a pool of
+    worker processes, each with its own recognizer, recognizes them. Frames
+    are submitted in a bounded window and results are consumed in frame
+    order, so events come out time-ordered and memory stays flat however
+    long the recording is. The gallery is loaded once, here, and handed to
+    the workers, which never read or write the template store.
+
+    Like the live apps, an identity is only confirmed once min_votes of
+    the last vote_window frames showing that face agree (IdentityVoter);
+    events carry the verdict in confirmed.
+    """
+
+    def __init__(self, recognizer_class=None, recognizer_kwargs: Optional[dict] = None,
+                 workers: Optional[int] = None, min_confidence: float = 0.5, queue_size: int = 64,
+                 min_votes: int = 3, vote_window: int = 5):
+        if recognizer_class is None:
+            from src.simple_face_recognition import SimpleFaceRecognizer
+            recognizer_class = SimpleFaceRecognizer
+        self.recognizer_class = recognizer_class
+        self.recognizer_kwargs = dict(recognizer_kwargs or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.min_confidence = min_confidence
+        self.queue_size = queue_size
+        self.min_votes = min_votes
+        self.vote_window = vote_window
+
+        self.frames_processed = 0
+        self.media_seconds = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def fps(self) -> float:
+        return self.frames_processed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        """Seconds of recording processed per second of wall time"""
+        return self.media_seconds / self.elapsed if self.elapsed else 0.0
+
+    def _decode(self, frames, frame_queue: queue.Queue, stop: threading.Event) -> None:
+        try:
+            for item in frames:
+                while not stop.is_set():
+                    try:
+                        frame_queue.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            frame_queue.put(e)
+        frame_queue.put(_END_OF_FRAMES)
+
+    def run(self, source: str, start_time: Optional[datetime] = None,
+            sample_fps: Optional[float] = None) -> Iterator[RecognitionEvent]:
+        """
+        Recognize a video file or image directory
+        Returns: Iterator of RecognitionEvent for known faces at or above min_confidence
+        """
+        started = time.perf_counter()
+        self.frames_processed = 0
+        first_timestamp = last_timestamp = None
+        templates = self.recognizer_class(**self.recognizer_kwargs).export_templates()
+        voter = IdentityVoter(self.min_votes, self.vote_window, threshold=self.min_confidence)
+
+        frame_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        decoder = threading.Thread(target=self._decode, daemon=True,
+                                   args=(iter_frames(source, start_time, sample_fps), frame_queue, stop))
+        decoder.start()
+
+        pending = deque()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                     initargs=(self.recognizer_class, self.recognizer_kwargs,
+                                               _attach_templates, templates)) as pool:
+                decoding = True
+                while decoding or pending:
+                    # Keep every worker busy without letting submitted frames pile up
+                    while decoding and len(pending) < self.workers * 2:
+                        item = frame_queue.get()
+                        if item is _END_OF_FRAMES:
+                            decoding = False
+                        elif isinstance(item, Exception):
+                            raise item
+                        else:
+                            index, timestamp, frame = item
+                            pending.append((index, timestamp, pool.submit(recognize, frame)))
+                    if not pending:
+                        break
+
+                    index, timestamp, future = pending.popleft()
+                    results = future.result()
+                    self.frames_processed += 1
+                    first_timestamp = first_timestamp or timestamp
+                    last_timestamp = timestamp
+                    self.elapsed = time.perf_counter() - started
+                    self.media_seconds = (last_timestamp - first_timestamp).total_seconds()
+
+                    confirmed = {box for _, box, _ in voter.update(results, now=timestamp.timestamp())}
+                    for name, box, confidence in results:
+                        if name != "Unknown" and confidence >= self.min_confidence:
+                            yield RecognitionEvent(source, index, timestamp, name, confidence, box,
+                                                   confirmed=box in confirmed)
+        finally:
+            stop.set()
+            self.elapsed = time.perf_counter() - started
+
+
+class AttendanceBackfill:
+    """
+    Replays confirmed recognition events from a recording into the
+    attendance table with the kiosk's rules: the first sighting of the day checks a person in
+    and a sighting at least cooldown seconds later checks them out. Records
+    written live before the outage are respected: nobody is checked in twice
+    and a time-out is never moved or set earlier than the check-in.
+    """
+
+    def __init__(self, db, cooldown: float = 15.0):
+        self.db = db
+        self.cooldown = cooldown
+        self.check_ins = 0
+        self.time_outs = 0
+        # (name, date) -> (time_in, time_out) as datetimes, or None when absent
+        self._days: Dict[Tuple[str, str], Tuple[Optional[datetime], Optional[datetime]]] = {}
+
+    def _day_state(self, name: str, day: str):
+        key = (name, day)
+        if key not in self._days:
+            records = self.db.get_attendance_records(date=day, name=name)
+            state = (None, None)
+            if records:
+                time_in, time_out = records[0][4], records[0][5]
+                state = (datetime.strptime(f"{day} {time_in}", "%Y-%m-%d %H:%M:%S") if time_in else None,
+                         datetime.strptime(f"{day} {time_out}", "%Y-%m-%d %H:%M:%S") if time_out else None)
+            self._days[key] = state
+        return self._days[key]
+
+    def apply(self, event: RecognitionEvent) -> Optional[str]:
+        """
+        Write the attendance change an event implies
+        Returns: "check_in", "time_out" or None when the event changes nothing
+        """
+        if not event.confirmed:
+            # A single frame is not enough to mark anyone, as in the live apps
+            return None
+        day = event.timestamp.strftime("%Y-%m-%d")
+        time_in, time_out = self._day_state(event.name, day)
+
+        if time_in is None:
+            if self.db.mark_attendance(event.name, timestamp=event.timestamp):
+                self._days[(event.name, day)] = (event.timestamp, None)
+                self.check_ins += 1
+                return "check_in"
+        elif time_out is None and (event.timestamp - time_in).total_seconds() >= self.cooldown:
+            if self.db.mark_time_out(event.name, timestamp=event.timestamp):
+                self._days[(event.name, day)] = (time_in, event.timestamp)
+                self.time_outs += 1
+                return "time_out"
+        return None
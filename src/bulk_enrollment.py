@@ -0,0 +1,182 @@
+"""
+Facial Recognition Attendance System - Bulk Enrollment Module
+Author: Uzman Jawaid
+Description: Parallel enrollment of face images from a directory tree
+Version: 2.0
+Date: August 2025
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.feature_cache import file_digest
+from src.recognition_workers import init_worker, worker_recognizer
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+MANIFEST_FILE = "enrollment.json"
+
+def scan_images(root: str) -> Dict[str, List[str]]:
+    """
+    Group the image files under root by person.
+    Sub-directories are people (data/faces/<name>/...). Loose files in root
+    are named after the file, minus a trailing _<number>, so an HR dump of
+    "Jane Doe.jpg" and "Jane Doe_2.jpg" becomes two samples for Jane Doe.
+    """
+    people: Dict[str, List[str]] = {}
+    for entry in sorted(os.listdir(root)):
+        path = os.path.join(root, entry)
+        if os.path.isdir(path):
+            files = [os.path.join(dirpath, filename)
+                     for dirpath, _, filenames in os.walk(path)
+                     for filename in sorted(filenames)
+                     if filename.lower().endswith(IMAGE_EXTENSIONS)]
+            if files:
+                people.setdefault(entry, []).extend(files)
+        elif entry.lower().endswith(IMAGE_EXTENSIONS):
+            name = re.sub(r'[_ -]\d+$', '', os.path.splitext(entry)[0]).strip()
+            people.setdefault(name, []).append(path)
+    return people
+
+
+def _encode(path: str) -> Tuple[str, Optional[np.ndarray], str]:
+    try:
+        features, message = worker_recognizer().encode_image_file(path)
+    except Exception as e:
+        return path, None, f"Error: {e}"
+    return path, features, message
+
+
+class EnrollmentReport:
+    """Outcome of a bulk enrollment run"""
+
+    def __init__(self):
+        self.enrolled: Dict[str, int] = {}  # name -> samples stored
+        self.unchanged: List[str] = []
+        self.failed: List[Tuple[str, str]] = []  # (path, reason)
+        self.images_processed = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f"Enrolled {len(self.enrolled)} people "
+                f"({sum(self.enrolled.values())} samples from {self.images_processed} images), "
+                f"{len(self.unchanged)} unchanged, {len(self.failed)} images failed "
+                f"in {self.elapsed:.1f}s")
+
+
+class BulkEnroller:
+    """
+    Enrolls every person found under a directory tree.
+
+    Image decoding, face detection and feature extraction run in a pool of
+    worker processes, each with its own recognizer of the same class. A
+    manifest of per-file sha256 digests next to the template store lets
+    re-runs skip people whose photos have not changed, and the recognizer's
+    feature cache means only new or edited photos of a changed person are
+    detected and encoded again. All new templates are committed with one
+    store write instead of one journal record per sample.
+    """
+
+    def __init__(self, recognizer, workers: Optional[int] = None,
+                 progress: Optional[Callable[[int, int, str, str], None]] = None):
+        self.recognizer = recognizer
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        self.manifest_path = os.path.join(recognizer.model_path, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict[str, Dict[str, str]]:
+        """Per person, the digest of every file enrolled last time"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest: Dict[str, Dict[str, str]]) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def enroll_directory(self, root: str, force: bool = False) -> EnrollmentReport:
+        """
+        Enroll everyone under root
+        Returns: EnrollmentReport with the people enrolled, skipped and failed images
+        """
+        started = time.perf_counter()
+        report = EnrollmentReport()
+        people = scan_images(root)
+        manifest = self.load_manifest()
+        known = set(self.recognizer.get_known_names())
+
+        digests = {}
+        pending: Dict[str, List[str]] = {}
+        for name, files in people.items():
+            digests[name] = {os.path.relpath(path, root): file_digest(path) for path in files}
+            if not force and name in known and manifest.get(name) == digests[name]:
+                report.unchanged.append(name)
+            else:
+                pending[name] = files
+
+        samples = self._encode_all(pending, report)
+
+        templates = {name: np.stack(features) for name, features in samples.items() if features}
+        if templates:
+            self.recognizer.enroll_batch(templates)
+            for name, features in templates.items():
+                manifest[name] = digests[name]
+                report.enrolled[name] = features.shape[0]
+            self.save_manifest(manifest)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _encode_all(self, pending: Dict[str, List[str]], report: EnrollmentReport) -> Dict[str, List[np.ndarray]]:
+        owner = {path: name for name, files in pending.items() for path in files}
+        samples: Dict[str, List[np.ndarray]] = {name: [] for name in pending}
+        total = len(owner)
+        if total == 0:
+            return samples
+
+        def collect(done, path, features, message):
+            report.images_processed += 1
+            if features is None:
+                report.failed.append((path, message))
+            else:
+                samples[owner[path]].append(np.ravel(features))
+            if self.progress is not None:
+                self.progress(done, total, path, message)
+
+        if self.workers <= 1:
+            for done, path in enumerate(owner, 1):
+                try:
+                    features, message = self.recognizer.encode_image_file(path)
+                except Exception as e:
+                    features, message = None, f"Error: {e}"
+                collect(done, path, features, message)
+            return samples
+
+        cache = self.recognizer.feature_cache
+        # Workers only extract features; they never load or write the template store
+        worker_kwargs = {'model_path': self.recognizer.model_path, 'legacy_model_path': None,
+                         'feature_cache_path': cache.directory if cache is not None else None,
+                         'detector': self.recognizer.detector.name}
+        if hasattr(self.recognizer, 'feature_type'):
+            worker_kwargs['feature_type'] = self.recognizer.feature_type
+        with ProcessPoolExecutor(max_workers=min(self.workers, total),
+                                 initializer=init_worker,
+                                 initargs=(type(self.recognizer), worker_kwargs)) as pool:
+            futures = [pool.submit(_encode, path) for path in owner]
+            for done, future in enumerate(as_completed(futures), 1):
+                collect(done, *future.result())
+        return samples
+
+
+def bulk_enroll(recognizer, root: str, workers: Optional[int] = None, force: bool = False,
+                progress: Optional[Callable[[int, int, str, str], None]] = None) -> EnrollmentReport:
+    """Enroll every person under root with a BulkEnroller"""
+    return BulkEnroller(recognizer, workers=workers, progress=progress).enroll_directory(root, force=force)
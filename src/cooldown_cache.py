@@ -0,0 +1,109 @@
+"""
+Facial Recognition Attendance System - Cooldown Cache Module
+Author: Uzman Jawaid
+Description: Bounded, expiring record of recent attendance actions per person
+Version: 2.0
+Date: August 2025
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+CHECK_IN = "check_in"
+CHECK_OUT = "check_out"
+
+# The action a sighting triggers, by Database.get_employee_status() status
+ACTIONS_BY_STATUS = {'not_present': CHECK_IN, 'checked_in': CHECK_OUT}
+
+
+class CooldownCache:
+    """
+    Remembers when each person last triggered an attendance action, so
+    repeat sightings within a cooldown are ignored.
+
+    The cooldown depends on the action about to be taken, e.g. a time-out
+    can be made to wait longer after a check-in than a repeated "already
+    checked out" notice. Entries expire once older than the longest
+    cooldown, and at most max_entries people are remembered (the least
+    recently acted on are evicted first), so a kiosk running for weeks
+    keeps a small, constant-size table. All methods are thread-safe.
+    """
+
+    def __init__(self, default: float = 15.0, cooldowns: Optional[Dict[str, float]] = None,
+                 max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.default = default
+        self.cooldowns = dict(cooldowns or {})
+        self.max_entries = max_entries
+        self.clock = clock
+        self.ttl = max([default] + list(self.cooldowns.values()))
+
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.suppressed = 0
+        self.evictions = 0
+
+    def cooldown(self, action: Optional[str]) -> float:
+        return self.cooldowns.get(action, self.default)
+
+    def _expire(self, now: float) -> None:
+        # Entries are kept in the order they were last acted on, oldest first
+        while self._entries:
+            name, last = next(iter(self._entries.items()))
+            if now - last < self.ttl and len(self._entries) <= self.max_entries:
+                break
+            self._entries.popitem(last=False)
+            if now - last < self.ttl:
+                self.evictions += 1
+
+    def allow(self, name: str, action: Optional[str] = None) -> bool:
+        """
+        Whether name may trigger action now; if so the time is recorded
+        Returns: False when name acted less than the action's cooldown ago
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self.lookups += 1
+            last = self._entries.get(name)
+            if last is not None:
+                self.hits += 1
+                if now - last < self.cooldown(action):
+                    self.suppressed += 1
+                    return False
+            self._entries[name] = now
+            self._entries.move_to_end(name)
+            self._expire(now)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups that found a recent action for the person"""
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    @property
+    def suppression_rate(self) -> float:
+        """Share of lookups ignored because the person was still cooling down"""
+        return self.suppressed / self.lookups if self.lookups else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'entries': len(self),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'suppressed': self.suppressed,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+            'suppression_rate': self.suppression_rate,
+        }
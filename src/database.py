@@ -8,22 +8,169 @@ Date: August 2025
 
 import sqlite3
 import os
+import threading
+import time
+import queue
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime, date
 
-class Database:
+_STOP_WRITER = object()
+
+
+class AttendanceStatusCache:
+    """
+    Today's (time_in, time_out) per employee, loaded with a single query
+    and kept current by the Database write methods. The day key rolls the
+    cache over at midnight; max_age bounds how long changes made by another
+    process (e.g. a manual time-out in the admin app) can go unseen.
+    """
+    
+    def __init__(self, max_age=30.0):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._day = None
+        self._loaded_at = None
+        self._entries = {}
+        self._writes = 0
+    
+    def is_current(self, today):
+        """True if the cache holds today's data and has not expired"""
+        if self._day != today or self._loaded_at is None:
+            return False
+        return self.max_age is None or time.monotonic() - self._loaded_at < self.max_age
+    
+    def write_count(self):
+        """Token taken before querying, so a load racing a write is not trusted"""
+        with self._lock:
+            return self._writes
+    
+    def load(self, today, rows, write_count):
+        """Replace the cache with today's (name, time_in, time_out) rows"""
+        with self._lock:
+            self._entries = {name: (time_in, time_out) for name, time_in, time_out in rows}
+            self._day = today
+            # A write committed during the query may be missing from rows; reload next time
+            self._loaded_at = time.monotonic() if write_count == self._writes else None
+    
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+    
+    def update(self, day, name, time_in, time_out):
+        """Write-through of a committed change; changes for another day are ignored"""
+        with self._lock:
+            self._writes += 1
+            if day == self._day:
+                self._entries[name] = (time_in, time_out)
+    
+    def invalidate(self):
+        with self._lock:
+            self._day = None
+
 
 class Database:
-    def __init__(self, db_path="data/attendance.db"):
+    # Applied to every pooled connection; WAL lets the Tk, video and
+    # attendance threads read while another thread writes
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-8000",
+    )
+    
+    # Schema migrations in order; PRAGMA user_version records the last one applied
+    MIGRATIONS = (
+        (1, '_create_tables'),
+        (2, '_add_attendance_indexes'),
+    )
+    
+    def __init__(self, db_path="data/attendance.db", status_cache_max_age=30.0,
+                 write_batch_window=0.05, write_batch_size=64):
         self.db_path = db_path
+        self.status_cache = AttendanceStatusCache(status_cache_max_age)
+        # Background writer that coalesces queued attendance events into batches
+        self.write_batch_window = write_batch_window
+        self.write_batch_size = write_batch_size
+        self._write_queue = queue.Queue()
+        self._writer_thread = None
+        self._writer_closed = False
+        self._writer_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
         self.init_database()
     
+    def _get_connection(self):
+        """Return this thread's long-lived connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None,
+                                   check_same_thread=False)
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            with self._connections_lock:
+                # Drop connections whose threads have finished
+                alive = []
+                for thread, thread_conn in self._connections:
+                    if thread.is_alive():
+                        alive.append((thread, thread_conn))
+                    else:
+                        thread_conn.close()
+                alive.append((threading.current_thread(), conn))
+                self._connections = alive
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the write lock up front to avoid upgrade deadlocks"""
+        conn = self._get_connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn.cursor()
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def close(self, timeout=10.0):
+        """Commit queued attendance writes, stop the writer and close every pooled connection"""
+        with self._writer_lock:
+            writer = self._writer_thread
+            self._writer_closed = True
+            if writer is not None:
+                self._write_queue.put(_STOP_WRITER)
+        if writer is not None:
+            writer.join(timeout)
+        
+        with self._connections_lock:
+            for _, conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+    
     def init_database(self):
         """Initialize the database with required tables"""
         # Create data directory if it doesn't exist
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._transaction() as cursor:
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            
+            for target_version, migration in self.MIGRATIONS:
+                if version < target_version:
+                    getattr(self, migration)(cursor)
+                    cursor.execute(f'PRAGMA user_version = {target_version:d}')
+                    version = target_version
+    
+    def _create_tables(self, cursor):
+        """Create the employees and attendance tables"""
         
         # Create employees table
         cursor.execute('''
@@ -51,57 +198,92 @@ class Database:
                 FOREIGN KEY (employee_id) REFERENCES employees (id)
             )
         ''')
+    
+    def _add_attendance_indexes(self, cursor):
+        """Index attendance lookups and allow one record per employee per day"""
+        # Older databases may hold duplicate rows for a day; merge them into the
+        # first one (earliest time in, latest time out) before deleting the rest
+        cursor.execute('''
+            UPDATE attendance SET
+                time_in = (SELECT MIN(d.time_in) FROM attendance d
+                           WHERE d.name = attendance.name AND d.date = attendance.date),
+                time_out = (SELECT MAX(d.time_out) FROM attendance d
+                            WHERE d.name = attendance.name AND d.date = attendance.date),
+                status = COALESCE(status, (SELECT d.status FROM attendance d
+                                           WHERE d.name = attendance.name AND d.date = attendance.date
+                                           AND d.status IS NOT NULL ORDER BY d.id LIMIT 1)),
+                employee_id = COALESCE(employee_id, (SELECT d.employee_id FROM attendance d
+                                                     WHERE d.name = attendance.name AND d.date = attendance.date
+                                                     AND d.employee_id IS NOT NULL ORDER BY d.id LIMIT 1))
+            WHERE id IN (
+                SELECT MIN(id) FROM attendance GROUP BY name, date HAVING COUNT(*) > 1
+            )
+        ''')
+        cursor.execute('''
+            DELETE FROM attendance WHERE id NOT IN (
+                SELECT MIN(id) FROM attendance GROUP BY name, date
+            )
+        ''')
+        
+        # Serves mark_attendance, mark_time_out and get_employee_status
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_name_date
+            ON attendance (name, date)
+        ''')
         
-        conn.commit()
-        conn.close()
+        # Covers get_checked_in_employees and the per-day reports
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS ix_attendance_date_open
+            ON attendance (date, time_out, time_in, name)
+        ''')
     
     def add_employee(self, name, email="", phone="", department=""):
         """Add a new employee to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            cursor.execute('''
-                INSERT INTO employees (name, email, phone, department)
-                VALUES (?, ?, ?, ?)
-            ''', (name, email, phone, department))
-            conn.commit()
-            return cursor.lastrowid
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO employees (name, email, phone, department)
+                    VALUES (?, ?, ?, ?)
+                ''', (name, email, phone, department))
+                return cursor.lastrowid
         except sqlite3.IntegrityError:
             return None
-        finally:
-            conn.close()
     
     def get_employee_by_name(self, name):
         """Get employee information by name"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         cursor.execute('SELECT * FROM employees WHERE name = ?', (name,))
         result = cursor.fetchone()
-        conn.close()
         
         return result
     
     def get_all_employees(self):
         """Get all employees"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         cursor.execute('SELECT * FROM employees ORDER BY name')
         results = cursor.fetchall()
-        conn.close()
         
         return results
     
-    def mark_attendance(self, name, status="Present"):
-        """Mark attendance for an employee"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        today = datetime.now().strftime("%Y-%m-%d")
-        current_time = datetime.now().strftime("%H:%M:%S")
-        
+    def mark_attendance(self, name, status="Present", timestamp=None):
+        """
+        Mark attendance for an employee
+        timestamp: When it happened (a datetime), for backfilling from recordings; defaults to now
+        """
+        when = timestamp or datetime.now()
+        today = when.strftime("%Y-%m-%d")
+        current_time = when.strftime("%H:%M:%S")
+        
+        with self._transaction() as cursor:
+            success, time_in, time_out = self._apply_attendance(cursor, name, status, today, current_time)
+        
+        self.status_cache.update(today, name, time_in, time_out)
+        return success
+    
+    def _apply_attendance(self, cursor, name, status, today, current_time):
+        """Check-in (or time-out update) inside the caller's transaction"""
         # Check if attendance already exists for today
         cursor.execute('''
             SELECT * FROM attendance WHERE name = ? AND date = ?
@@ -114,52 +296,171 @@ class Database:
             cursor.execute('''
                 UPDATE attendance SET time_out = ? WHERE name = ? AND date = ?
             ''', (current_time, name, today))
-        else:
-            # Create new attendance record
-            employee = self.get_employee_by_name(name)
-            employee_id = employee[0] if employee else None
-            
-            cursor.execute('''
-                INSERT INTO attendance (employee_id, name, date, time_in, status)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (employee_id, name, today, current_time, status))
+            return True, existing[4], current_time
         
-        conn.commit()
-        conn.close()
+        # Create new attendance record
+        cursor.execute('SELECT id FROM employees WHERE name = ?', (name,))
+        employee = cursor.fetchone()
+        employee_id = employee[0] if employee else None
         
-        return True
+        cursor.execute('''
+            INSERT INTO attendance (employee_id, name, date, time_in, status)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (employee_id, name, today, current_time, status))
+        return True, current_time, None
+    
+    def mark_time_out(self, name, timestamp=None):
+        """
+        Explicitly mark time out for an employee
+        timestamp: When it happened (a datetime), for backfilling from recordings; defaults to now
+        """
+        when = timestamp or datetime.now()
+        today = when.strftime("%Y-%m-%d")
+        current_time = when.strftime("%H:%M:%S")
+        
+        with self._transaction() as cursor:
+            updated, time_in, time_out = self._apply_time_out(cursor, name, today, current_time)
+        
+        if updated:
+            self.status_cache.update(today, name, time_in, time_out)
+        
+        # False when not checked in or already checked out
+        return updated
     
-    def mark_time_out(self, name):
-        """Explicitly mark time out for an employee"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _apply_time_out(self, cursor, name, today, current_time):
+        """Time-out inside the caller's transaction"""
+        # Update time_out only if the employee is checked in today
+        cursor.execute('''
+            UPDATE attendance SET time_out = ? WHERE name = ? AND date = ? AND time_out IS NULL
+        ''', (current_time, name, today))
         
-        today = datetime.now().strftime("%Y-%m-%d")
-        current_time = datetime.now().strftime("%H:%M:%S")
+        if cursor.rowcount == 0:
+            return False, None, None
         
-        # Check if employee is checked in today
         cursor.execute('''
-            SELECT * FROM attendance WHERE name = ? AND date = ? AND time_out IS NULL
+            SELECT time_in FROM attendance WHERE name = ? AND date = ?
         ''', (name, today))
+        return True, cursor.fetchone()[0], current_time
+    
+    def submit_attendance(self, name, status="Present"):
+        """
+        Queue a check-in for the background writer
+        Returns: Future resolving to the same value as mark_attendance
+        """
+        return self._submit_write('attendance', name, status)
+    
+    def submit_time_out(self, name):
+        """
+        Queue a time-out for the background writer
+        Returns: Future resolving to the same value as mark_time_out
+        """
+        return self._submit_write('time_out', name, None)
+    
+    def _submit_write(self, operation, name, status):
+        future = Future()
+        with self._writer_lock:
+            if self._writer_closed:
+                raise RuntimeError("Database writer has been closed")
+            self._ensure_writer()
+            self._write_queue.put((operation, name, status, future))
+        return future
+    
+    def _ensure_writer(self):
+        """Start the writer, or restart one that died, so queued writes are drained; needs _writer_lock"""
+        if self._writer_thread is None or not self._writer_thread.is_alive():
+            self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer_thread.start()
+    
+    def flush(self, timeout=None):
+        """
+        Block until every queued attendance write has been committed
+        Returns: True once nothing is pending, False if timeout expired first
+        """
+        with self._writer_lock:
+            # close() already drained the queue, and nothing has been queued without a writer
+            if self._writer_closed or self._writer_thread is None:
+                return True
+            self._ensure_writer()
+            done = threading.Event()
+            self._write_queue.put(done)
+        return done.wait(timeout)
+    
+    def _writer_loop(self):
+        """Drain the write queue, committing each batch in a single transaction"""
+        while True:
+            item = self._write_queue.get()
+            batch = []
+            markers = []
+            stop = False
+            deadline = time.monotonic() + self.write_batch_window
+            
+            while True:
+                if item is _STOP_WRITER:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                
+                if stop or len(batch) >= self.write_batch_size:
+                    break
+                try:
+                    item = self._write_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            
+            if batch:
+                self._commit_batch(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+    
+    def _commit_batch(self, batch):
+        """Apply a batch of queued writes; duplicates of the same event share one result"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        current_time = datetime.now().strftime("%H:%M:%S")
         
-        existing = cursor.fetchone()
+        # Several kiosks seeing the same person at once queue the same event
+        events = {}
+        for operation, name, status, future in batch:
+            events.setdefault((operation, name, status), []).append(future)
         
-        if existing:
-            # Update time_out
-            cursor.execute('''
-                UPDATE attendance SET time_out = ? WHERE name = ? AND date = ? AND time_out IS NULL
-            ''', (current_time, name, today))
-            conn.commit()
-            conn.close()
-            return True
-        else:
-            conn.close()
-            return False  # Not checked in or already checked out
+        try:
+            results = {}
+            with self._transaction() as cursor:
+                for operation, name, status in events:
+                    if operation == 'attendance':
+                        results[(operation, name, status)] = self._apply_attendance(
+                            cursor, name, status or "Present", today, current_time)
+                    else:
+                        results[(operation, name, status)] = self._apply_time_out(
+                            cursor, name, today, current_time)
+        except Exception as e:
+            print(f"Error committing attendance batch: {e}")
+            # Retry one event at a time so a single bad event cannot fail the rest
+            for (operation, name, status), futures in events.items():
+                try:
+                    if operation == 'attendance':
+                        result = self.mark_attendance(name, status or "Present")
+                    else:
+                        result = self.mark_time_out(name)
+                    for future in futures:
+                        future.set_result(result)
+                except Exception as event_error:
+                    for future in futures:
+                        future.set_exception(event_error)
+            return
+        
+        for (operation, name, status), (success, time_in, time_out) in results.items():
+            if success:
+                self.status_cache.update(today, name, time_in, time_out)
+            for future in events[(operation, name, status)]:
+                future.set_result(success)
     
     def get_checked_in_employees(self):
         """Get list of employees currently checked in (no time_out)"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         today = datetime.now().strftime("%Y-%m-%d")
         
@@ -170,24 +471,17 @@ class Database:
         ''', (today,))
         
         results = cursor.fetchall()
-        conn.close()
         
         return results
     
     def get_employee_status(self, name):
-        """Get current attendance status for an employee"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        """Get current attendance status for an employee (served from the status cache)"""
         today = datetime.now().strftime("%Y-%m-%d")
         
-        cursor.execute('''
-            SELECT time_in, time_out FROM attendance 
-            WHERE name = ? AND date = ?
-        ''', (name, today))
+        if not self.status_cache.is_current(today):
+            self.refresh_status_cache(today)
         
-        result = cursor.fetchone()
-        conn.close()
+        result = self.status_cache.get(name)
         
         if result:
             time_in, time_out = result
@@ -198,10 +492,21 @@ class Database:
         else:
             return "not_present", None, None
     
+    def refresh_status_cache(self, today=None):
+        """Reload today's statuses for every employee with one query"""
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        write_count = self.status_cache.write_count()
+        cursor = self._get_connection().cursor()
+        
+        cursor.execute('''
+            SELECT name, time_in, time_out FROM attendance WHERE date = ?
+        ''', (today,))
+        
+        self.status_cache.load(today, cursor.fetchall(), write_count)
+    
     def get_attendance_records(self, date=None, name=None):
         """Get attendance records with optional filters"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         query = 'SELECT * FROM attendance'
         params = []
@@ -224,14 +529,12 @@ class Database:
         
         cursor.execute(query, params)
         results = cursor.fetchall()
-        conn.close()
         
         return results
     
     def get_attendance_summary(self, start_date=None, end_date=None):
         """Get attendance summary with statistics"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._get_connection().cursor()
         
         query = '''
             SELECT name, COUNT(*) as days_present,
@@ -259,6 +562,5 @@ class Database:
         
         cursor.execute(query, params)
         results = cursor.fetchall()
-        conn.close()
         
         return results
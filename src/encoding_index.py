@@ -0,0 +1,338 @@
+"""
+Facial Recognition Attendance System - Encoding Index Module
+Author: Uzman Jawaid
+Description: Exact and approximate nearest-neighbour search over face encodings
+Version: 2.0
+Date: August 2025
+"""
+
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+class BruteForceIndex:
+    """
+    Exact Euclidean search over a contiguous float32 matrix of encodings.
+    Rows are appended into spare capacity, so enrolling one person does not
+    copy the whole gallery, and their squared norms are cached so a frame
+    of faces is scored with a single matrix product.
+    """
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+        self.names: List[str] = []
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The live rows, in the same order as names"""
+        return self._matrix[:len(self.names)]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def build(self, names: List[str], matrix) -> None:
+        """Replace the index contents"""
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(len(names), -1) if len(names) else \
+            np.empty((0, self.dim), dtype=np.float32)
+        self.names = list(names)
+        self._matrix = np.array(matrix, dtype=np.float32, order='C')
+        self._norms = _row_norms(self._matrix)
+        if len(names):
+            self.dim = matrix.shape[1]
+
+    def add(self, name: str, vector) -> None:
+        """Append one encoding for name"""
+        count = len(self.names)
+        if count == self._matrix.shape[0]:
+            capacity = max(16, count * 2)
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:count] = self._matrix[:count]
+            self._matrix = grown
+            grown_norms = np.empty(capacity, dtype=np.float32)
+            grown_norms[:count] = self._norms[:count]
+            self._norms = grown_norms
+        self._matrix[count] = np.ravel(vector)
+        self._norms[count] = _row_norms(self._matrix[count:count + 1])[0]
+        self.names.append(name)
+
+    def remove(self, name: str) -> bool:
+        """Remove every encoding belonging to name"""
+        keep = [i for i, n in enumerate(self.names) if n != name]
+        if len(keep) == len(self.names):
+            return False
+        self._matrix = np.ascontiguousarray(self.matrix[keep])
+        self._norms = self._norms[keep]
+        self.names = [self.names[i] for i in keep]
+        return True
+
+    def search(self, queries, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest encodings for each query (rows)
+        Returns: Tuple (distances, row indices), both shaped (queries, k), nearest first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        count = len(self.names)
+        if count == 0 or queries.shape[0] == 0:
+            return (np.empty((queries.shape[0], 0), dtype=np.float32),
+                    np.empty((queries.shape[0], 0), dtype=np.int64))
+
+        # One matrix product scores every query against every row
+        squared = _squared_distances(queries, self.matrix, self._norms[:count])
+        _, rows = _top_k(squared, np.arange(count), k)
+        return _rescore(queries, self._matrix, rows)
+
+
+class IVFIndex:
+    """
+    Inverted-file index: a k-means coarse quantizer splits the gallery into
+    n_lists cells and a query is compared exactly against the encodings in
+    its n_probe closest cells only. Adds go to the closest existing cell and
+    removals drop rows from their cell, so no retraining is needed until
+    the gallery has changed a lot (see needs_retrain).
+    """
+
+    def __init__(self, dim: int = 128, n_lists: Optional[int] = None, n_probe: int = 8,
+                 train_iterations: int = 10, seed: int = 0):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.seed = seed
+
+        self.names: List[Optional[str]] = []
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self.lists: List[np.ndarray] = []
+        self._rows_by_name: Dict[str, List[int]] = {}
+        self._live = 0
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """The live rows, in the same order as live_names"""
+        return self._matrix[self._live_rows()]
+
+    @property
+    def live_names(self) -> List[str]:
+        return [self.names[i] for i in self._live_rows()]
+
+    def _live_rows(self) -> np.ndarray:
+        return np.array([i for i, n in enumerate(self.names) if n is not None], dtype=np.int64)
+
+    def build(self, names: List[str], matrix) -> None:
+        """Train the coarse quantizer on the gallery and fill the inverted lists"""
+        matrix = np.asarray(matrix, dtype=np.float32).reshape(len(names), -1) if len(names) else \
+            np.empty((0, self.dim), dtype=np.float32)
+        self.names = list(names)
+        self._matrix = np.array(matrix, dtype=np.float32, order='C')
+        self._norms = _row_norms(self._matrix)
+        self._live = len(names)
+        self._trained_size = len(names)
+        self._rows_by_name = {}
+        for row, name in enumerate(self.names):
+            self._rows_by_name.setdefault(name, []).append(row)
+
+        if len(names) == 0:
+            self.centroids = np.empty((0, self.dim), dtype=np.float32)
+            self.lists = []
+            return
+        self.dim = matrix.shape[1]
+
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(names))))
+        self.centroids = _kmeans(self._matrix, n_lists, self.train_iterations, self.seed)
+        assignment = _nearest_centroid(self._matrix, self.centroids)
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def add(self, name: str, vector) -> None:
+        """Add one encoding to the cell of its nearest centroid"""
+        vector = np.ravel(np.asarray(vector, dtype=np.float32))
+        if len(self.centroids) == 0:
+            self.build([n for n in self.names if n is not None] + [name],
+                       np.vstack([self.matrix, vector[np.newaxis, :]]))
+            return
+
+        row = len(self.names)
+        if row == self._matrix.shape[0]:
+            capacity = max(16, row * 2)
+            grown = np.empty((capacity, self.dim), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+            grown_norms = np.empty(capacity, dtype=np.float32)
+            grown_norms[:row] = self._norms[:row]
+            self._norms = grown_norms
+        self._matrix[row] = vector
+        self._norms[row] = float(vector @ vector)
+        self.names.append(name)
+        self._rows_by_name.setdefault(name, []).append(row)
+        self._live += 1
+
+        cell = int(_nearest_centroid(vector[np.newaxis, :], self.centroids)[0])
+        self.lists[cell] = np.append(self.lists[cell], row)
+
+    def remove(self, name: str) -> bool:
+        """Remove every encoding belonging to name"""
+        rows = self._rows_by_name.pop(name, None)
+        if not rows:
+            return False
+        removed = np.array(rows, dtype=np.int64)
+        for cell, members in enumerate(self.lists):
+            if np.isin(members, removed).any():
+                self.lists[cell] = members[~np.isin(members, removed)]
+        for row in rows:
+            self.names[row] = None
+        self._live -= len(rows)
+        return True
+
+    def needs_retrain(self) -> bool:
+        """Cells drift as people are added and removed; retrain once the gallery doubled or halved"""
+        return self._live > 2 * max(1, self._trained_size) or self._live * 2 < self._trained_size
+
+    def search(self, queries, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find (approximately) the k nearest encodings for each query
+        Returns: Tuple (distances, row indices), both shaped (queries, k), nearest first
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self._live == 0 or queries.shape[0] == 0:
+            return (np.empty((queries.shape[0], 0), dtype=np.float32),
+                    np.empty((queries.shape[0], 0), dtype=np.int64))
+
+        n_probe = min(self.n_probe, len(self.centroids))
+        coarse = _squared_distances(queries, self.centroids)
+        probe_cells = np.argpartition(coarse, n_probe - 1, axis=1)[:, :n_probe]
+
+        all_distances = np.full((queries.shape[0], k), np.inf, dtype=np.float32)
+        all_rows = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for q, cells in enumerate(probe_cells):
+            candidates = np.concatenate([self.lists[c] for c in cells])
+            if candidates.size == 0:
+                continue
+            squared = _squared_distances(queries[q:q + 1], self._matrix[candidates], self._norms[candidates])
+            _, top_rows = _top_k(squared, candidates, k)
+            top_distances, top_rows = _rescore(queries[q:q + 1], self._matrix, top_rows)
+            all_distances[q, :top_distances.shape[1]] = top_distances[0]
+            all_rows[q, :top_rows.shape[1]] = top_rows[0]
+        return all_distances, all_rows
+
+
+def _row_norms(matrix: np.ndarray) -> np.ndarray:
+    """Squared L2 norm of every row"""
+    return np.einsum('ij,ij->i', matrix, matrix).astype(np.float32)
+
+
+def _squared_distances(queries: np.ndarray, matrix: np.ndarray,
+                       matrix_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """Pairwise squared Euclidean distances via |q|^2 + |x|^2 - 2 q.x"""
+    if matrix_norms is None:
+        matrix_norms = _row_norms(matrix)
+    distances = queries @ matrix.T
+    distances *= -2.0
+    distances += _row_norms(queries)[:, np.newaxis]
+    distances += matrix_norms[np.newaxis, :]
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def _rescore(queries: np.ndarray, matrix: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact distances for the selected rows, re-sorted. The norm expansion
+    loses a little float32 precision, so thresholds are applied to
+    distances computed directly, like face_recognition.face_distance.
+    """
+    distances = np.linalg.norm(matrix[rows] - queries[:, np.newaxis, :], axis=2).astype(np.float32)
+    order = np.argsort(distances, axis=1, kind='stable')
+    return np.take_along_axis(distances, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+
+def _top_k(distances: np.ndarray, row_ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, distances.shape[1])
+    if k < distances.shape[1]:
+        part = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(distances.shape[1]), (distances.shape[0], 1))
+    part_distances = np.take_along_axis(distances, part, axis=1)
+    order = np.argsort(part_distances, axis=1, kind='stable')
+    return (np.take_along_axis(part_distances, order, axis=1).astype(np.float32),
+            row_ids[np.take_along_axis(part, order, axis=1)])
+
+
+def _nearest_centroid(matrix: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    assignment = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], chunk):
+        block = matrix[start:start + chunk]
+        assignment[start:start + chunk] = np.argmin(_squared_distances(block, centroids), axis=1)
+    return assignment
+
+
+def _kmeans(matrix: np.ndarray, n_clusters: int, iterations: int, seed: int,
+            max_training_points: int = 50000) -> np.ndarray:
+    """Plain Lloyd's k-means on (a sample of) the gallery"""
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, matrix.shape[0])
+    sample = matrix
+    if matrix.shape[0] > max_training_points:
+        sample = matrix[rng.choice(matrix.shape[0], max_training_points, replace=False)]
+
+    centroids = sample[rng.choice(sample.shape[0], n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroid(sample, centroids)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        occupied = counts > 0
+        centroids[occupied] = sums[occupied] / counts[occupied, np.newaxis]
+        # Re-seed empty cells from random points so every cell stays useful
+        empty = np.flatnonzero(~occupied)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+    return centroids
+
+
+def make_index(gallery_size: int, dim: int = 128, ivf_threshold: int = 20000, **ivf_options):
+    """Exact search for small galleries, IVF once exact search gets expensive"""
+    if gallery_size >= ivf_threshold:
+        return IVFIndex(dim=dim, **ivf_options)
+    return BruteForceIndex(dim=dim)
+
+
+def recall_report(names: List[str], matrix, queries, k: int = 1, n_probe_values=(1, 2, 4, 8, 16, 32),
+                  n_lists: Optional[int] = None) -> List[dict]:
+    """
+    Compare IVF search against exact search on the same gallery
+    Returns: One dict per n_probe with recall@k and mean per-query latency of both
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    exact = BruteForceIndex(dim=queries.shape[1])
+    exact.build(names, matrix)
+
+    start = time.perf_counter()
+    _, exact_rows = exact.search(queries, k)
+    exact_ms = (time.perf_counter() - start) * 1000.0 / queries.shape[0]
+
+    approximate = IVFIndex(dim=queries.shape[1], n_lists=n_lists)
+    approximate.build(names, matrix)
+
+    report = []
+    for n_probe in n_probe_values:
+        approximate.n_probe = n_probe
+        start = time.perf_counter()
+        _, rows = approximate.search(queries, k)
+        ivf_ms = (time.perf_counter() - start) * 1000.0 / queries.shape[0]
+
+        hits = sum(len(set(found) & set(expected)) for found, expected in zip(rows.tolist(), exact_rows.tolist()))
+        report.append({
+            'n_probe': n_probe,
+            'n_lists': len(approximate.centroids),
+            f'recall@{k}': hits / float(exact_rows.size),
+            'ivf_ms_per_query': ivf_ms,
+            'exact_ms_per_query': exact_ms,
+        })
+    return report
@@ -0,0 +1,218 @@
+"""
+Facial Recognition Attendance System - Face Detector Module
+Author: Uzman Jawaid
+Description: Interchangeable CPU face detection backends with latency tracking
+Version: 2.0
+Date: August 2025
+"""
+
+import os
+import time
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+DETECTOR_MODEL_DIR = "models/detectors"
+
+
+class DetectorStats:
+    """Latency of a detector's calls: the last one and a running mean"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+
+    def record(self, elapsed_ms: float) -> None:
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.last_ms = elapsed_ms
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+class FaceDetector:
+    """
+    Common interface of the detection backends.
+
+    detect() takes a BGR or grayscale image and returns an (N, 4) int array
+    of (x, y, w, h) boxes in that image's coordinates; subclasses implement
+    _detect(). Every call is timed into stats, so backends can be compared
+    on the kiosk CPU they will actually run on.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = DetectorStats()
+
+    def detect(self, image, min_size: Optional[int] = None, max_size: Optional[int] = None) -> np.ndarray:
+        """
+        Detect faces, optionally only those between min_size and max_size pixels wide
+        Returns: Array of (x, y, w, h) boxes
+        """
+        started = time.perf_counter()
+        boxes = np.asarray(self._detect(image, min_size, max_size), dtype=np.int32).reshape(-1, 4)
+        if len(boxes) and (min_size or max_size):
+            widths = boxes[:, 2]
+            keep = np.ones(len(boxes), dtype=bool)
+            if min_size:
+                keep &= widths >= min_size
+            if max_size:
+                keep &= widths <= max_size
+            boxes = boxes[keep]
+        self.stats.record((time.perf_counter() - started) * 1000.0)
+        return boxes
+
+    def _detect(self, image, min_size, max_size) -> np.ndarray:
+        raise NotImplementedError
+
+    @staticmethod
+    def _gray(image) -> np.ndarray:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    @staticmethod
+    def _bgr(image) -> np.ndarray:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if image.ndim == 2 else image
+
+
+def _require_model_file(path: str, description: str) -> str:
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{description} not found at {path}; "
+                                f"download it into {DETECTOR_MODEL_DIR}/ or pass its path")
+    return path
+
+
+class CascadeDetector(FaceDetector):
+    """OpenCV cascade classifier: Haar (accurate) or LBP (faster, integer features)"""
+
+    name = "haar"
+
+    def __init__(self, cascade_path: Optional[str] = None, scale_factor: float = 1.1, min_neighbors: int = 4):
+        super().__init__()
+        cascade_path = cascade_path or cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.cascade = cv2.CascadeClassifier(_require_model_file(cascade_path, "Cascade file"))
+        if self.cascade.empty():
+            raise ValueError(f"Could not load cascade from {cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def _detect(self, image, min_size, max_size):
+        size_limits = {}
+        if min_size:
+            size_limits['minSize'] = (int(min_size),) * 2
+        if max_size:
+            size_limits['maxSize'] = (int(max_size),) * 2
+        return self.cascade.detectMultiScale(self._gray(image), self.scale_factor, self.min_neighbors,
+                                             **size_limits)
+
+
+class LBPCascadeDetector(CascadeDetector):
+    """LBP cascade; OpenCV's pip wheels only ship Haar cascades, so the XML is loaded from disk"""
+
+    name = "lbp"
+
+    def __init__(self, cascade_path: Optional[str] = None, scale_factor: float = 1.1, min_neighbors: int = 4):
+        super().__init__(cascade_path or os.path.join(DETECTOR_MODEL_DIR, "lbpcascade_frontalface_improved.xml"),
+                         scale_factor, min_neighbors)
+
+
+class HOGDetector(FaceDetector):
+    """dlib's HOG + linear SVM detector, via the optional face_recognition package"""
+
+    name = "hog"
+
+    def __init__(self, upsample: int = 1):
+        super().__init__()
+        try:
+            import face_recognition
+        except ImportError as e:
+            raise ImportError("The HOG detector needs the face_recognition package "
+                              "(pip install face-recognition dlib)") from e
+        self._face_recognition = face_recognition
+        self.upsample = upsample
+
+    def _detect(self, image, min_size, max_size):
+        rgb = cv2.cvtColor(self._bgr(image), cv2.COLOR_BGR2RGB)
+        locations = self._face_recognition.face_locations(rgb, self.upsample, model="hog")
+        return [(left, top, right - left, bottom - top) for top, right, bottom, left in locations]
+
+
+class SSDDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD face detector (Caffe model, 300x300 input)"""
+
+    name = "ssd"
+
+    def __init__(self, prototxt_path: Optional[str] = None, model_path: Optional[str] = None,
+                 confidence: float = 0.5, input_size: int = 300):
+        super().__init__()
+        prototxt_path = prototxt_path or os.path.join(DETECTOR_MODEL_DIR, "deploy.prototxt")
+        model_path = model_path or os.path.join(DETECTOR_MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+        self.net = cv2.dnn.readNetFromCaffe(_require_model_file(prototxt_path, "SSD prototxt"),
+                                            _require_model_file(model_path, "SSD weights"))
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def _detect(self, image, min_size, max_size):
+        image = self._bgr(image)
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+
+        detections = detections[detections[:, 2] >= self.confidence]
+        corners = detections[:, 3:7] * np.array([width, height, width, height], dtype=np.float32)
+        corners = np.clip(corners, 0, [width - 1, height - 1, width - 1, height - 1]).astype(np.int32)
+        boxes = np.column_stack([corners[:, :2], corners[:, 2:] - corners[:, :2]])
+        return boxes[(boxes[:, 2] > 0) & (boxes[:, 3] > 0)]
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV's YuNet face detector (ONNX model, cv2.FaceDetectorYN, OpenCV 4.5.4+)"""
+
+    name = "yunet"
+
+    def __init__(self, model_path: Optional[str] = None, confidence: float = 0.7, nms_threshold: float = 0.3):
+        super().__init__()
+        if not hasattr(cv2, 'FaceDetectorYN'):
+            raise ImportError("The YuNet detector needs OpenCV 4.5.4 or newer")
+        model_path = model_path or os.path.join(DETECTOR_MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+        self.detector = cv2.FaceDetectorYN.create(_require_model_file(model_path, "YuNet model"), "",
+                                                  (320, 320), confidence, nms_threshold)
+        self._input_size: Tuple[int, int] = (320, 320)
+
+    def _detect(self, image, min_size, max_size):
+        image = self._bgr(image)
+        size = (image.shape[1], image.shape[0])
+        if size != self._input_size:
+            self.detector.setInputSize(size)
+            self._input_size = size
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return np.empty((0, 4), dtype=np.int32)
+        return np.round(faces[:, :4]).astype(np.int32)
+
+
+DETECTORS = {
+    'haar': CascadeDetector,
+    'lbp': LBPCascadeDetector,
+    'hog': HOGDetector,
+    'ssd': SSDDetector,
+    'yunet': YuNetDetector,
+}
+
+
+def make_detector(detector="haar", **options) -> FaceDetector:
+    """
+    Create a detection backend by name ("haar", "lbp", "hog", "ssd", "yunet");
+    an existing FaceDetector is returned unchanged
+    """
+    if isinstance(detector, FaceDetector):
+        return detector
+    try:
+        backend = DETECTORS[detector]
+    except KeyError:
+        raise ValueError(f"Unknown face detector '{detector}', choose from {', '.join(DETECTORS)}") from None
+    return backend(**options)
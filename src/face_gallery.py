@@ -0,0 +1,174 @@
+"""
+Facial Recognition Attendance System - Face Gallery Module
+Author: Uzman Jawaid
+Description: Contiguous template matrix for batched correlation matching
+Version: 2.0
+Date: August 2025
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class FaceGallery:
+    """
+    Keeps every enrolled template as one row of a contiguous float32 matrix.
+    Rows are mean-centred and L2-normalised when they are added, so the
+    Pearson correlation used by cv2.HISTCMP_CORREL reduces to a dot product
+    and a whole frame of faces is scored with a single matrix product.
+
+    A person may own several rows (one per enrolment sample). Scores are
+    aggregated per identity by taking the mean of each identity's top_k
+    sample scores, so top_k=1 matches on the single closest sample.
+    """
+
+    def __init__(self, dim: Optional[int] = None, top_k: int = 1):
+        self.names: List[str] = []
+        self.matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self.top_k = top_k
+        self._layout = None
+
+    @staticmethod
+    def normalize(features) -> np.ndarray:
+        """Mean-centre and L2-normalise feature vectors (one per row)"""
+        features = np.atleast_2d(np.asarray(features, dtype=np.float32))
+        centered = features - features.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(centered, axis=1, keepdims=True)
+        return np.ascontiguousarray(centered / np.maximum(norms, 1e-12), dtype=np.float32)
+
+    def build(self, names: Iterable[str], features) -> None:
+        """Replace the gallery contents with the given names and raw features (one row each)"""
+        self.names = list(names)
+        self._layout = None
+        if self.names:
+            self.matrix = self.normalize(np.stack([np.ravel(f) for f in features]))
+        else:
+            self.matrix = np.empty((0, self.matrix.shape[1]), dtype=np.float32)
+
+    def attach(self, names: List[str], matrix) -> None:
+        """Use an already-normalised matrix as-is (e.g. a read-only memory map)"""
+        self.names = list(names)
+        self.matrix = matrix
+        self._layout = None
+
+    def add(self, name: str, features) -> int:
+        """
+        Set the templates for name, replacing any it already has.
+        features is one feature vector or a (samples, dim) array of them.
+        Returns: Number of rows added (they are the last rows of the matrix)
+        """
+        features = np.asarray(features, dtype=np.float32)
+        rows = self.normalize(features.reshape(-1, features.shape[-1]))
+        if name in self.names:
+            keep = np.array([n != name for n in self.names], dtype=bool)
+            self.names = [n for n in self.names if n != name]
+            self.matrix = self.matrix[keep]
+        if len(self.names) == 0:
+            self.matrix = rows
+        else:
+            self.matrix = np.vstack([self.matrix, rows])
+        self.names.extend([name] * rows.shape[0])
+        self._layout = None
+        return rows.shape[0]
+
+    def add_many(self, templates: Dict[str, object]) -> None:
+        """Set the templates of several people at once with a single matrix rebuild"""
+        if not templates:
+            return
+        keep = [i for i, n in enumerate(self.names) if n not in templates]
+        names = [self.names[i] for i in keep]
+        blocks = [np.asarray(self.matrix)[keep]] if keep else []
+        for name, features in templates.items():
+            features = np.asarray(features, dtype=np.float32)
+            rows = self.normalize(features.reshape(-1, features.shape[-1]))
+            blocks.append(rows)
+            names.extend([name] * rows.shape[0])
+        self.names = names
+        self.matrix = np.ascontiguousarray(np.vstack(blocks), dtype=np.float32)
+        self._layout = None
+
+    def remove(self, name: str) -> bool:
+        """Remove every template belonging to name"""
+        if name not in self.names:
+            return False
+        keep = np.array([n != name for n in self.names], dtype=bool)
+        self.names = [n for n in self.names if n != name]
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self._layout = None
+        return True
+
+    def known_names(self) -> List[str]:
+        """Distinct enrolled names in enrolment order"""
+        return list(dict.fromkeys(self.names))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _identity_layout(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Distinct names plus a (identities, max_samples) table of their row
+        numbers, padded with -1. Rebuilt only after the gallery changes.
+        """
+        if self._layout is None:
+            identities = self.known_names()
+            owner_of = {name: owner for owner, name in enumerate(identities)}
+            owners = np.fromiter((owner_of[n] for n in self.names), dtype=np.int64, count=len(self.names))
+            counts = np.bincount(owners, minlength=len(identities))
+
+            order = np.argsort(owners, kind='stable')
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            slots = np.arange(len(order)) - starts[owners[order]]
+
+            table = np.full((len(identities), int(counts.max(initial=0))), -1, dtype=np.int64)
+            table[owners[order], slots] = order
+            self._layout = (identities, table)
+        return self._layout
+
+    def score(self, probe_features) -> np.ndarray:
+        """Correlation of every probe (rows) against every template (columns)"""
+        probes = self.normalize(probe_features)
+        return probes @ self.matrix.T
+
+    def score_identities(self, probe_features) -> Tuple[List[str], np.ndarray]:
+        """
+        Per-identity score of every probe: the mean of its top_k best samples
+        Returns: Tuple (names, scores) with scores shaped (probes, names)
+        """
+        identities, table = self._identity_layout()
+        scores = self.score(probe_features)
+
+        # Column -1 of the padded table picks up the trailing -inf column
+        padded = np.concatenate([scores, np.full((scores.shape[0], 1), -np.inf, dtype=scores.dtype)], axis=1)
+        per_sample = padded[:, table]
+        if self.top_k <= 1 or table.shape[1] == 1:
+            return identities, per_sample.max(axis=2)
+
+        k = min(self.top_k, table.shape[1])
+        best = np.partition(per_sample, table.shape[1] - k, axis=2)[:, :, -k:]
+        present = np.isfinite(best)
+        totals = np.where(present, best, 0.0).sum(axis=2)
+        return identities, totals / np.maximum(present.sum(axis=2), 1)
+
+    def match(self, probe_features, threshold: float = 0.6) -> List[Tuple[str, float]]:
+        """
+        Find the best identity for each probe
+        Returns: List of tuples (name, confidence), "Unknown" with 0 below threshold
+        """
+        probes = np.atleast_2d(probe_features)
+        if len(self.names) == 0 or probes.shape[0] == 0:
+            return [("Unknown", 0) for _ in range(probes.shape[0])]
+
+        identities, scores = self.score_identities(probes)
+        best_index = np.argmax(scores, axis=1)
+        best_score = scores[np.arange(scores.shape[0]), best_index]
+
+        results = []
+        for index, confidence in zip(best_index, best_score):
+            if confidence > threshold and confidence > 0:
+                results.append((identities[index], float(confidence)))
+            else:
+                results.append(("Unknown", 0))
+        return results
@@ -3,76 +3,185 @@ import face_recognition
 import numpy as np
 import os
 import pickle
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+from src.face_detectors import make_detector
+from src.feature_cache import FeatureCache
+from src.template_store import TemplateStore
+from src.encoding_index import BruteForceIndex, IVFIndex, make_index
 
 class FaceRecognizer:
-    def __init__(self, model_path="models/face_encodings.pkl"):
+    # Bump whenever the encoding model changes its output; the detector name is appended
+    FEATURE_VERSION = "dlib-128d-v1"
+    
+    def __init__(self, model_path="models/encodings", legacy_model_path="models/face_encodings.pkl",
+                 tolerance=0.6, ivf_threshold=20000, feature_cache_path="models/feature_cache",
+                 detector="hog", load_templates=True):
+        """load_templates: Load the encodings from the store; False for workers that only extract features"""
         self.model_path = model_path
+        self.legacy_model_path = legacy_model_path
+        self.tolerance = tolerance
+        self.ivf_threshold = ivf_threshold
+        self.store = TemplateStore(model_path)
+        self.detector = make_detector(detector)
+        self.feature_version = f"{self.FEATURE_VERSION}-{self.detector.name}"
+        self.feature_cache = FeatureCache(feature_cache_path, self.feature_version) if feature_cache_path else None
         self.known_face_encodings = []
         self.known_face_names = []
-        self.load_known_faces()
+        self.index = BruteForceIndex()
+        if load_templates:
+            self.load_known_faces()
     
     def load_known_faces(self):
-        """Load known face encodings from pickle file"""
-        if os.path.exists(self.model_path):
+        """Load known face encodings from the template store, replaying its journal"""
+        if not self.store.exists() and self.legacy_model_path and os.path.exists(self.legacy_model_path):
+            self.migrate_legacy_encodings()
+        
+        if self.store.exists():
             try:
-                with open(self.model_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.known_face_encodings = data['encodings']
-                    self.known_face_names = data['names']
-                print(f"Loaded {len(self.known_face_names)} known faces")
+                names, matrix = self.store.load()
+                self.known_face_encodings = [matrix[i] for i in range(len(names))]
+                self.known_face_names = list(names)
+                print(f"Loaded {len(self.known_face_names)} face encodings "
+                      f"for {len(set(self.known_face_names))} people")
             except Exception as e:
                 print(f"Error loading face encodings: {e}")
                 self.known_face_encodings = []
                 self.known_face_names = []
         else:
             print("No existing face encodings found")
+        self.rebuild_index()
+    
+    def export_templates(self):
+        """The loaded encodings as (names, matrix), e.g. to hand to worker processes"""
+        return self._encodings_snapshot()
+    
+    def attach_templates(self, names, matrix):
+        """Use encodings loaded elsewhere instead of reading the store"""
+        self.known_face_encodings = [matrix[i] for i in range(len(names))]
+        self.known_face_names = list(names)
+        self.rebuild_index()
+    
+    def rebuild_index(self):
+        """Rebuild the search index, exact for small galleries and IVF for large ones"""
+        self.index = make_index(len(self.known_face_names), ivf_threshold=self.ivf_threshold)
+        self.index.build(self.known_face_names, self._as_matrix(self.known_face_encodings))
+    
+    def _index_needs_rebuild(self):
+        if isinstance(self.index, IVFIndex):
+            return self.index.needs_retrain() or len(self.index) < self.ivf_threshold // 2
+        return len(self.index) >= self.ivf_threshold
+    
+    def migrate_legacy_encodings(self) -> bool:
+        """One-shot conversion of the old face_encodings.pkl into the template store"""
+        try:
+            with open(self.legacy_model_path, 'rb') as f:
+                data = pickle.load(f)
+            self.store.save(data['names'], self._as_matrix(data['encodings']))
+            os.replace(self.legacy_model_path, self.legacy_model_path + ".migrated")
+            print(f"Migrated {len(data['names'])} face encodings from {self.legacy_model_path}")
+            return True
+        except Exception as e:
+            print(f"Error migrating face encodings: {e}")
+            return False
     
     def save_known_faces(self):
-        """Save known face encodings to pickle file"""
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        """Write a full snapshot of the face encodings and empty the journal"""
         try:
-            data = {
-                'encodings': self.known_face_encodings,
-                'names': self.known_face_names
-            }
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(data, f)
+            self.store.compact(self._encodings_snapshot)
             print("Face encodings saved successfully")
         except Exception as e:
             print(f"Error saving face encodings: {e}")
     
+    @staticmethod
+    def _as_matrix(encodings):
+        if len(encodings) == 0:
+            return np.empty((0, 128), dtype=np.float32)
+        return np.array(encodings, dtype=np.float32)
+    
+    def _encodings_snapshot(self):
+        return list(self.known_face_names), self._as_matrix(self.known_face_encodings)
+    
+    def _drop_encodings(self, name: str):
+        keep = [i for i, known in enumerate(self.known_face_names) if known != name]
+        self.known_face_encodings = [self.known_face_encodings[i] for i in keep]
+        self.known_face_names = [self.known_face_names[i] for i in keep]
+    
+    def _store_encoding(self, name: str, encodings):
+        """
+        Add or replace a person's encodings (one encoding or one row per sample)
+        and journal the change instead of rewriting the store. Matching takes
+        the nearest sample, i.e. the best-scoring one for each person.
+        """
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, 128)
+        with self.store.lock:
+            if name in self.known_face_names:
+                self._drop_encodings(name)
+                self.store.delete(name)
+                self.index.remove(name)
+            for encoding in encodings:
+                self.known_face_encodings.append(encoding)
+                self.known_face_names.append(name)
+                self.store.append(name, encoding)
+                self.index.add(name, encoding)
+        if self._index_needs_rebuild():
+            self.rebuild_index()
+        self._compact_if_needed()
+    
+    def enroll_batch(self, templates: Dict[str, np.ndarray]):
+        """Set the encodings of many people and write them as one new store generation"""
+        with self.store.lock:
+            for name, encodings in templates.items():
+                self._drop_encodings(name)
+                for encoding in np.asarray(encodings, dtype=np.float32).reshape(-1, 128):
+                    self.known_face_encodings.append(encoding)
+                    self.known_face_names.append(name)
+            self.store.save(*self._encodings_snapshot())
+            self.rebuild_index()
+    
+    def _compact_if_needed(self):
+        if self.store.needs_compaction(len(self.known_face_names)):
+            self.store.compact(self._encodings_snapshot, background=True)
+    
+    def encode_image_file(self, image_path: str) -> Tuple[Optional[np.ndarray], str]:
+        """
+        Compute the encoding of the single face in an image file, reusing
+        the cached encoding when the same image was seen before
+        Returns: Tuple (encoding, message); encoding is None when the image is unusable
+        """
+        if self.feature_cache is not None:
+            return self.feature_cache.lookup(image_path, self._encode_image_file)
+        return self._encode_image_file(image_path)
+    
+    def _encode_image_file(self, image_path: str) -> Tuple[Optional[np.ndarray], str]:
+        # Load the image
+        image = face_recognition.load_image_file(image_path)
+        
+        # Get face encodings
+        face_locations = self.detect_face_locations(cv2.cvtColor(image, cv2.COLOR_RGB2BGR))
+        face_encodings = face_recognition.face_encodings(image, face_locations)
+        
+        if len(face_encodings) == 0:
+            return None, "No face found in the image"
+        
+        if len(face_encodings) > 1:
+            return None, "Multiple faces found. Please use an image with only one face"
+        
+        return face_encodings[0], "ok"
+    
     def add_new_face(self, image_path: str, name: str) -> bool:
         """Add a new face to the known faces database"""
         try:
-            # Load the image
-            image = face_recognition.load_image_file(image_path)
-            
-            # Get face encodings
-            face_encodings = face_recognition.face_encodings(image)
-            
-            if len(face_encodings) == 0:
-                print("No face found in the image")
+            face_encoding, message = self.encode_image_file(image_path)
+            if face_encoding is None:
+                print(message)
                 return False
             
-            if len(face_encodings) > 1:
-                print("Multiple faces found. Please use an image with only one face")
-                return False
-            
-            # Add the face encoding and name
-            face_encoding = face_encodings[0]
-            
             # Check if person already exists
             if name in self.known_face_names:
                 print(f"Person {name} already exists. Updating encoding...")
-                index = self.known_face_names.index(name)
-                self.known_face_encodings[index] = face_encoding
-            else:
-                self.known_face_encodings.append(face_encoding)
-                self.known_face_names.append(name)
             
-            # Save the updated encodings
-            self.save_known_faces()
+            # Journal the updated encoding
+            self._store_encoding(name, face_encoding)
             print(f"Successfully added/updated face for {name}")
             return True
             
@@ -90,25 +199,13 @@ class FaceRecognizer:
         rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
         
         # Find face locations and encodings
-        face_locations = face_recognition.face_locations(rgb_small_frame)
+        face_locations = self.detect_face_locations(small_frame)
         face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
         
         recognized_faces = []
+        matches = self.match_encodings(face_encodings)
         
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            # Compare with known faces
-            matches = face_recognition.compare_faces(self.known_face_encodings, face_encoding)
-            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-            
-            name = "Unknown"
-            confidence = 0
-            
-            if len(face_distances) > 0:
-                best_match_index = np.argmin(face_distances)
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    confidence = 1 - face_distances[best_match_index]
-            
+        for (name, confidence), face_location in zip(matches, face_locations):
             # Scale back up face locations
             top, right, bottom, left = face_location
             top *= 4
@@ -120,6 +217,37 @@ class FaceRecognizer:
         
         return recognized_faces
     
+    def detect_face_locations(self, image) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces in a BGR image with the configured backend
+        Returns: List of (top, right, bottom, left) locations, as face_recognition uses
+        """
+        return [(int(y), int(x + w), int(y + h), int(x)) for x, y, w, h in self.detector.detect(image)]
+    
+    def match_encodings(self, face_encodings) -> List[Tuple[str, float]]:
+        """
+        Match face encodings against the known faces
+        Returns: List of tuples (name, confidence), "Unknown" with 0 when nothing is close enough
+        """
+        results = []
+        if len(face_encodings) == 0:
+            return results
+        
+        # Every face in the frame is scored in one pass; the threshold below
+        # reuses those distances instead of computing them again per face
+        distances, rows = self.index.search(np.asarray(face_encodings, dtype=np.float32), k=1)
+        
+        for face_distances, face_rows in zip(distances, rows):
+            name = "Unknown"
+            confidence = 0
+            
+            if len(face_distances) > 0 and face_rows[0] >= 0 and face_distances[0] <= self.tolerance:
+                name = self.index.names[face_rows[0]]
+                confidence = 1 - float(face_distances[0])
+            
+            results.append((name, confidence))
+        return results
+    
     def capture_face_for_training(self, name: str, num_photos: int = 5) -> bool:
         """Capture multiple photos of a person for training"""
         cap = cv2.VideoCapture(0)
@@ -173,13 +301,12 @@ class FaceRecognizer:
                 image_path = os.path.join(face_dir, filename)
                 
                 try:
-                    image = face_recognition.load_image_file(image_path)
-                    face_encodings = face_recognition.face_encodings(image)
+                    face_encoding, message = self.encode_image_file(image_path)
                     
-                    if len(face_encodings) == 1:
-                        encodings.append(face_encodings[0])
+                    if face_encoding is not None:
+                        encodings.append(face_encoding)
                     else:
-                        print(f"Warning: Found {len(face_encodings)} faces in {filename}")
+                        print(f"Warning: {filename}: {message}")
                 
                 except Exception as e:
                     print(f"Error processing {filename}: {e}")
@@ -188,28 +315,21 @@ class FaceRecognizer:
             print("No valid face encodings found")
             return False
         
-        # Average the encodings for better accuracy
-        average_encoding = np.mean(encodings, axis=0)
-        
-        # Add to known faces
-        if name in self.known_face_names:
-            index = self.known_face_names.index(name)
-            self.known_face_encodings[index] = average_encoding
-        else:
-            self.known_face_encodings.append(average_encoding)
-            self.known_face_names.append(name)
-        
-        self.save_known_faces()
+        # Keep every sample so pose and lighting variation is matched too
+        self._store_encoding(name, np.stack(encodings))
         print(f"Successfully processed {len(encodings)} images for {name}")
         return True
     
     def remove_person(self, name: str) -> bool:
         """Remove a person from the known faces database"""
         if name in self.known_face_names:
-            index = self.known_face_names.index(name)
-            del self.known_face_names[index]
-            del self.known_face_encodings[index]
-            self.save_known_faces()
+            with self.store.lock:
+                self._drop_encodings(name)
+                self.store.delete(name)
+                self.index.remove(name)
+            if self._index_needs_rebuild():
+                self.rebuild_index()
+            self._compact_if_needed()
             print(f"Removed {name} from database")
             return True
         else:
@@ -218,4 +338,4 @@ class FaceRecognizer:
     
     def get_known_names(self) -> List[str]:
         """Get list of all known person names"""
-        return self.known_face_names.copy()
+        return list(dict.fromkeys(self.known_face_names))
@@ -0,0 +1,135 @@
+"""
+Facial Recognition Attendance System - Face Tracking Module
+Author: Uzman Jawaid
+Description: Detect-once, track-between-detections wrapper for recognizers
+Version: 2.0
+Date: August 2025
+"""
+
+import cv2
+import numpy as np
+from typing import List, Tuple
+
+
+class FaceTrack:
+    """One tracked face: identity from the last full recognition plus its current box"""
+
+    def __init__(self, name: str, confidence: float, box: Tuple[int, int, int, int], template: np.ndarray):
+        self.name = name
+        self.confidence = confidence
+        self.box = box  # (x, y, w, h) in tracking-resolution pixels
+        self.template = template
+
+
+class TrackingRecognizer:
+    """
+    Runs the wrapped recognizer (full detection plus matching) only every
+    detect_interval frames. In between, each face is followed by normalised
+    template matching in a small search window on a downscaled grayscale
+    frame, and its identity is carried forward. A track whose match score
+    drops below min_track_score forces a full recognition on that frame.
+
+    Exposes the same recognize_faces_in_frame() as the recognizers, and every
+    other attribute is forwarded to the wrapped recognizer.
+    """
+
+    def __init__(self, recognizer, detect_interval: int = 10, min_track_score: float = 0.6,
+                 search_margin: float = 0.5, track_scale: float = 0.5):
+        self.recognizer = recognizer
+        self.detect_interval = detect_interval
+        self.min_track_score = min_track_score
+        self.search_margin = search_margin
+        self.track_scale = track_scale
+
+        self.tracks: List[FaceTrack] = []
+        self.frames_since_detection = detect_interval
+        self.detections = 0
+        self.tracked_frames = 0
+
+    def __getattr__(self, attribute):
+        if attribute == 'recognizer':
+            raise AttributeError(attribute)
+        return getattr(self.recognizer, attribute)
+
+    @property
+    def last_frame_detected(self) -> bool:
+        """Whether the latest results came from a full recognition rather than tracking"""
+        return self.frames_since_detection == 0
+
+    def reset(self) -> None:
+        """Drop all tracks so the next frame runs a full recognition"""
+        self.tracks = []
+        self.frames_since_detection = self.detect_interval
+
+    def _tracking_gray(self, frame) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.track_scale != 1.0:
+            gray = cv2.resize(gray, (0, 0), fx=self.track_scale, fy=self.track_scale,
+                              interpolation=cv2.INTER_AREA)
+        return gray
+
+    def recognize_faces_in_frame(self, frame) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+        """
+        Recognize faces, running full detection only when due or when a track is lost
+        Returns: List of tuples (name, (top, right, bottom, left), confidence)
+        """
+        gray = self._tracking_gray(frame)
+
+        # With nobody tracked this also spaces out detection on an empty scene
+        if self.frames_since_detection < self.detect_interval - 1:
+            if self._update_tracks(gray):
+                self.frames_since_detection += 1
+                self.tracked_frames += 1
+                return self._results()
+
+        return self._detect(frame, gray)
+
+    def _detect(self, frame, gray) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+        results = self.recognizer.recognize_faces_in_frame(frame)
+        self.detections += 1
+        self.frames_since_detection = 0
+
+        self.tracks = []
+        for name, (top, right, bottom, left), confidence in results:
+            x = int(left * self.track_scale)
+            y = int(top * self.track_scale)
+            w = max(1, int((right - left) * self.track_scale))
+            h = max(1, int((bottom - top) * self.track_scale))
+            template = gray[y:y+h, x:x+w].copy()
+            if template.size > 0:
+                self.tracks.append(FaceTrack(name, confidence, (x, y, w, h), template))
+        return results
+
+    def _update_tracks(self, gray) -> bool:
+        """Move every track to its best match; False if any track was lost"""
+        frame_h, frame_w = gray.shape[:2]
+        for track in self.tracks:
+            x, y, w, h = track.box
+            margin_x = int(w * self.search_margin)
+            margin_y = int(h * self.search_margin)
+            x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+            x1, y1 = min(frame_w, x + w + margin_x), min(frame_h, y + h + margin_y)
+
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < h or window.shape[1] < w:
+                return False
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, best_score, _, (best_x, best_y) = cv2.minMaxLoc(scores)
+            if best_score < self.min_track_score:
+                return False
+
+            track.box = (x0 + best_x, y0 + best_y, w, h)
+            # Refresh the template so slow pose and lighting changes are followed
+            track.template = gray[track.box[1]:track.box[1]+h, track.box[0]:track.box[0]+w].copy()
+        return True
+
+    def _results(self) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+        scale = 1.0 / self.track_scale
+        results = []
+        for track in self.tracks:
+            x, y, w, h = track.box
+            top, left = int(y * scale), int(x * scale)
+            bottom, right = int((y + h) * scale), int((x + w) * scale)
+            results.append((track.name, (top, right, bottom, left), track.confidence))
+        return results
@@ -0,0 +1,96 @@
+"""
+Facial Recognition Attendance System - Feature Cache Module
+Author: Uzman Jawaid
+Description: On-disk cache of extracted face features keyed by image content
+Version: 2.0
+Date: August 2025
+"""
+
+import hashlib
+import os
+import numpy as np
+from typing import Optional, Tuple
+
+
+def file_digest(path: str) -> str:
+    """sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    Remembers what detection and feature extraction produced for an image,
+    keyed by the sha256 of the file content under a feature version. Renamed
+    or re-captured copies of the same photo hit the cache, and changing the
+    recognizer's feature version starts a fresh namespace instead of
+    returning stale features.
+
+    Images without a usable face are cached too (with the reason), so a bad
+    photo in a bulk import is not re-detected on every run. Entries are
+    written to a temp file and renamed, so several processes can share a
+    cache directory.
+    """
+
+    def __init__(self, directory="models/feature_cache", version="v1"):
+        self.directory = directory
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.directory, self.version, digest[:2], digest)
+
+    def get(self, digest: str) -> Optional[Tuple[Optional[np.ndarray], str]]:
+        """
+        Look up a cached result
+        Returns: Tuple (features, message) as computed before, or None on a miss
+        """
+        path = self._entry_path(digest)
+        try:
+            if os.path.exists(path + ".npy"):
+                features = np.load(path + ".npy")
+                self.hits += 1
+                return features, "ok"
+            if os.path.exists(path + ".txt"):
+                with open(path + ".txt", 'r', encoding='utf-8') as f:
+                    message = f.read()
+                self.hits += 1
+                return None, message
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable feature cache entry {digest}: {e}")
+        self.misses += 1
+        return None
+
+    def put(self, digest: str, features: Optional[np.ndarray], message: str = "ok") -> None:
+        """Cache the features extracted from an image, or the reason there were none"""
+        path = self._entry_path(digest)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            if features is not None:
+                with open(temp_path, 'wb') as f:
+                    np.save(f, np.asarray(features, dtype=np.float32))
+                os.replace(temp_path, path + ".npy")
+            else:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(message)
+                os.replace(temp_path, path + ".txt")
+        except OSError as e:
+            print(f"Could not write feature cache entry {digest}: {e}")
+
+    def lookup(self, image_path: str, compute) -> Tuple[Optional[np.ndarray], str]:
+        """
+        Return the cached result for an image file, computing and caching it on a miss.
+        compute is called with the image path and returns (features, message).
+        """
+        digest = file_digest(image_path)
+        cached = self.get(digest)
+        if cached is not None:
+            return cached
+        features, message = compute(image_path)
+        self.put(digest, features, message)
+        return features, message
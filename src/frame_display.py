@@ -0,0 +1,84 @@
+"""
+Facial Recognition Attendance System - Frame Display Module
+Author: Uzman Jawaid
+Description: Shows camera frames in a Tkinter label without per-frame allocations
+Version: 2.0
+Date: August 2025
+"""
+
+import threading
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class TkFrameDisplay:
+    """
+    Displays frames produced on a worker thread in a Tk label.
+
+    show() runs on the worker (the pipeline's render stage): it resizes the
+    frame with INTER_AREA and converts it to RGBA into preallocated buffers,
+    then marks it ready. Each buffer is wrapped once in a PIL image that
+    shares its memory (PIL only maps 4-byte pixels, hence RGBA). Tk is only
+    touched from the main loop, where a root.after timer running at max_fps
+    pastes the newest ready frame into one PhotoImage that is created once
+    and updated in place. Frames shown faster than max_fps simply replace
+    each other.
+    """
+
+    def __init__(self, root, label, size: Tuple[int, int] = (800, 600), max_fps: float = 30.0):
+        self.root = root
+        self.label = label
+        self.size = size
+        self.interval_ms = max(1, int(1000 / max_fps))
+
+        width, height = size
+        self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        # The worker fills the back buffer while the main loop reads the front one
+        self._back = np.empty((height, width, 4), dtype=np.uint8)
+        self._front = np.empty((height, width, 4), dtype=np.uint8)
+        self._back_image = Image.frombuffer('RGBA', size, self._back, 'raw', 'RGBA', 0, 1)
+        self._front_image = Image.frombuffer('RGBA', size, self._front, 'raw', 'RGBA', 0, 1)
+        self._lock = threading.Lock()
+        self._fresh = False
+        self._photo: Optional[ImageTk.PhotoImage] = None
+        self._after_id = None
+        self.frames_shown = 0
+
+    def start(self) -> None:
+        """Start the display timer; call from the Tk main loop"""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval_ms, self._refresh)
+
+    def stop(self) -> None:
+        """Stop the display timer; call from the Tk main loop"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        with self._lock:
+            self._fresh = False
+
+    def show(self, frame) -> None:
+        """Queue a BGR frame for display; safe to call from any thread"""
+        cv2.resize(frame, self.size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._resized, cv2.COLOR_BGR2RGBA, dst=self._back)
+        with self._lock:
+            self._back, self._front = self._front, self._back
+            self._back_image, self._front_image = self._front_image, self._back_image
+            self._fresh = True
+
+    def _refresh(self) -> None:
+        self._after_id = self.root.after(self.interval_ms, self._refresh)
+        with self._lock:
+            if not self._fresh:
+                return
+            self._fresh = False
+            if self._photo is None:
+                self._photo = ImageTk.PhotoImage(self._front_image)
+                self.label.config(image=self._photo, text='')
+            else:
+                self._photo.paste(self._front_image)
+                if not self.label.cget('image'):
+                    self.label.config(image=self._photo, text='')
+        self.frames_shown += 1
@@ -0,0 +1,114 @@
+"""
+Facial Recognition Attendance System - Identity Voting Module
+Author: Uzman Jawaid
+Description: Confirms recognised identities by voting across frames
+Version: 2.0
+Date: August 2025
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+
+class VoteTrack:
+    """One face followed across frames, with its votes for a candidate identity"""
+
+    __slots__ = ('box', 'name', 'history', 'rival', 'rival_history', 'last_seen')
+
+    def __init__(self, box: Tuple[int, int, int, int], now: float):
+        self.box = box  # (top, right, bottom, left)
+        # Bit i of a history is set when the i-th most recent vote was for that name
+        self.name: Optional[str] = None
+        self.history = 0
+        self.rival: Optional[str] = None
+        self.rival_history = 0
+        self.last_seen = now
+
+
+class IdentityVoter:
+    """
+    Accepts an identity only once min_votes of the last window votes on the
+    same face agree on it with confidence above threshold.
+
+    Faces are followed between calls by matching box centres. Each track's
+    state is constant-size: a candidate and a rival name, each with a
+    window-bit vote history. A name without votes in the window gives up
+    its slot to the next confident name, and the rival takes over as
+    candidate once it has more votes. Pass fresh=False for frames whose
+    results were carried forward by a tracker rather than recognised
+    again: they move tracks but do not vote.
+    """
+
+    def __init__(self, min_votes: int = 3, window: int = 5, threshold: float = 0.5,
+                 max_shift: float = 0.5, forget_after: float = 2.0):
+        if not 1 <= min_votes <= window:
+            raise ValueError("min_votes must be between 1 and window")
+        self.min_votes = min_votes
+        self.window = window
+        self.threshold = threshold
+        self.max_shift = max_shift
+        self.forget_after = forget_after
+        self.tracks: List[VoteTrack] = []
+        self._mask = (1 << window) - 1
+
+    def reset(self) -> None:
+        self.tracks = []
+
+    @staticmethod
+    def votes(history: int) -> int:
+        return bin(history).count('1')
+
+    def _match(self, box, unmatched: List[VoteTrack]) -> Optional[VoteTrack]:
+        """Nearest unmatched track whose centre is within max_shift face widths"""
+        top, right, bottom, left = box
+        cx, cy = (left + right) / 2, (top + bottom) / 2
+        limit = self.max_shift * max(1, right - left)
+        best, best_distance = None, limit
+        for track in unmatched:
+            t_top, t_right, t_bottom, t_left = track.box
+            distance = max(abs((t_left + t_right) / 2 - cx), abs((t_top + t_bottom) / 2 - cy))
+            if distance <= best_distance:
+                best, best_distance = track, distance
+        return best
+
+    def _vote(self, track: VoteTrack, name: str, confidence: float) -> None:
+        if name == "Unknown" or confidence <= self.threshold:
+            name = None
+        elif name != track.name and name != track.rival:
+            if track.history == 0:
+                track.name = name
+            elif track.rival_history == 0:
+                track.rival = name
+        track.history = ((track.history << 1) | int(name is not None and name == track.name)) & self._mask
+        track.rival_history = ((track.rival_history << 1) | int(name is not None and name == track.rival)) & self._mask
+        if self.votes(track.rival_history) > self.votes(track.history):
+            track.name, track.rival = track.rival, track.name
+            track.history, track.rival_history = track.rival_history, track.history
+
+    def update(self, results, fresh: bool = True,
+               now: Optional[float] = None) -> List[Tuple[str, Tuple[int, int, int, int], float]]:
+        """
+        Add one frame's recognitions; now is the frame time in seconds for
+        recorded footage (default: the current monotonic time)
+        Returns: List of tuples (name, (top, right, bottom, left), confidence) for confirmed faces in this frame
+        """
+        if now is None:
+            now = time.monotonic()
+        unmatched = list(self.tracks)
+        confirmed = []
+        for name, box, confidence in results:
+            track = self._match(box, unmatched)
+            if track is None:
+                track = VoteTrack(box, now)
+                self.tracks.append(track)
+            else:
+                unmatched.remove(track)
+                track.box = box
+                track.last_seen = now
+            if fresh:
+                self._vote(track, name, confidence)
+            if track.name == name and self.votes(track.history) >= self.min_votes:
+                confirmed.append((name, box, confidence))
+
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.forget_after]
+        return confirmed
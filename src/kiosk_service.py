@@ -0,0 +1,209 @@
+"""
+Facial Recognition Attendance System - Headless Kiosk Service
+Author: Uzman Jawaid
+Description: Attendance recognition loop for door controllers without a display
+Version: 2.0
+Date: August 2025
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Optional, Union
+import cv2
+
+from src.cooldown_cache import ACTIONS_BY_STATUS, CHECK_OUT, CooldownCache
+from src.face_tracker import TrackingRecognizer
+from src.identity_voting import IdentityVoter
+from src.video_pipeline import FrameRateGovernor, VideoPipeline
+
+logger = logging.getLogger("attendance.kiosk")
+
+
+class PacedCapture:
+    """
+    Plays a video file at its recorded frame rate, so a file behaves like the
+    live camera it was recorded from instead of being read as fast as possible
+    """
+
+    def __init__(self, capture: cv2.VideoCapture):
+        self.capture = capture
+        self.frame_interval = 1.0 / (capture.get(cv2.CAP_PROP_FPS) or 25.0)
+        self._next_frame = None
+
+    def read(self):
+        now = time.monotonic()
+        if self._next_frame is not None and now < self._next_frame:
+            time.sleep(self._next_frame - now)
+        self._next_frame = max(now, self._next_frame or now) + self.frame_interval
+        return self.capture.read()
+
+    def release(self) -> None:
+        self.capture.release()
+
+
+def open_source(source: Union[int, str], pace_files: bool = True):
+    """Open a camera index ("0"), an RTSP/HTTP stream URL or a video file"""
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise IOError(f"Could not open video source {source}")
+    if pace_files and isinstance(source, str) and os.path.isfile(source):
+        return PacedCapture(capture)
+    return capture
+
+
+class KioskAttendance:
+    """
+    The kiosk attendance rules, shared by every headless service: a
+    confidently recognised person is checked in, then timed out on a later
+    visit, and repeat sightings within the cooldown are ignored (a time-out
+    waits check_out_cooldown, default cooldown, after the last action).
+    Outcomes are logged instead of shown in a window.
+    """
+
+    def __init__(self, db, min_confidence: float = 0.5, cooldown: float = 15.0,
+                 check_out_cooldown: Optional[float] = None):
+        self.db = db
+        self.min_confidence = min_confidence
+        self.recent_actions = CooldownCache(default=cooldown, cooldowns={
+            CHECK_OUT: cooldown if check_out_cooldown is None else check_out_cooldown})
+
+    def process_recognitions(self, faces, camera: str = "") -> None:
+        """Attendance for every confidently recognised face"""
+        for name, _, confidence in faces:
+            if name != "Unknown" and confidence > self.min_confidence:
+                status, _, _ = self.db.get_employee_status(name)
+                self.mark_attendance_smart(name, status, confidence, camera)
+
+    def mark_attendance_smart(self, name: str, current_status: str, confidence: float, camera: str = "") -> None:
+        """Check in or time out, ignoring repeat sightings within the cooldown"""
+        if not self.recent_actions.allow(name, ACTIONS_BY_STATUS.get(current_status)):
+            return
+
+        where = f" at {camera}" if camera else ""
+        if current_status == "not_present":
+            future = self.db.submit_attendance(name)
+            future.add_done_callback(lambda f: self._log_write(name, "check-in", confidence, where, f))
+        elif current_status == "checked_in":
+            future = self.db.submit_time_out(name)
+            future.add_done_callback(lambda f: self._log_write(name, "time-out", confidence, where, f))
+        elif current_status == "checked_out":
+            logger.info("%s already completed attendance for today%s", name, where)
+
+    def log_stats(self) -> None:
+        stats = self.recent_actions.stats()
+        logger.info("cooldown cache: %d people, %d lookups, %.0f%% hits, %.0f%% suppressed, %d evicted",
+                    stats['entries'], stats['lookups'], 100 * stats['hit_rate'],
+                    100 * stats['suppression_rate'], stats['evictions'])
+
+    @staticmethod
+    def _log_write(name: str, action: str, confidence: float, where: str, future) -> None:
+        if future.exception() is not None:
+            logger.error("%s for %s%s failed: %s", action, name, where, future.exception())
+        elif future.result():
+            logger.info("%s: %s%s (confidence %.2f)", action, name, where, confidence)
+        else:
+            logger.warning("%s for %s%s was not recorded", action, name, where)
+
+
+class KioskService:
+    """
+    The user app's recognition and attendance loop without Tkinter.
+
+    Frames go through the same VideoPipeline and TrackingRecognizer as the
+    GUI, but without a render stage: nothing is mirrored, resized, colour
+    converted or turned into a PhotoImage. As in the GUI, a face only counts
+    once min_votes of its last vote_window full recognitions agree on who it
+    is; attendance then follows the kiosk rules in KioskAttendance. Unless
+    governor is False, a FrameRateGovernor (configured by governor_options)
+    idles recognition while the entrance is empty.
+    """
+
+    def __init__(self, recognizer, db, min_confidence: float = 0.5, cooldown: float = 15.0,
+                 detect_interval: int = 10, governor: bool = True,
+                 governor_options: Optional[dict] = None, check_out_cooldown: Optional[float] = None,
+                 min_votes: int = 2, vote_window: int = 3):
+        self.recognizer = recognizer
+        self.db = db
+        self.attendance = KioskAttendance(db, min_confidence, cooldown, check_out_cooldown)
+        self.voter = IdentityVoter(min_votes, vote_window, threshold=min_confidence)
+        self.detect_interval = detect_interval
+        self.governor = governor
+        self.governor_options = dict(governor_options or {})
+
+        self.pipeline: Optional[VideoPipeline] = None
+        self.tracker: Optional[TrackingRecognizer] = None
+        self._stopping = threading.Event()
+
+    def run(self, source: Union[int, str], reconnect: bool = False, retry_delay: float = 5.0,
+            stats_interval: float = 30.0) -> None:
+        """
+        Process frames from source until it ends or stop() is called.
+        With reconnect, a camera or stream that drops is reopened after retry_delay.
+        """
+        self._stopping.clear()
+        while not self._stopping.is_set():
+            try:
+                capture = open_source(source)
+            except IOError as e:
+                if not reconnect:
+                    raise
+                logger.warning("%s; retrying in %.0fs", e, retry_delay)
+                self._stopping.wait(retry_delay)
+                continue
+
+            logger.info("Reading frames from %s", source)
+            self.tracker = TrackingRecognizer(self.recognizer, detect_interval=self.detect_interval)
+            self.voter.reset()
+            self.pipeline = VideoPipeline(capture, self.tracker,
+                                          on_results=self.process_recognitions, mirror=False,
+                                          governor=self._make_governor())
+            self.pipeline.start()
+
+            next_report = time.monotonic() + stats_interval
+            while self.pipeline.running and not self._stopping.is_set():
+                self._stopping.wait(0.5)
+                if time.monotonic() >= next_report:
+                    self.log_stats()
+                    next_report = time.monotonic() + stats_interval
+
+            self.pipeline.stop(wait=True)
+            self.log_stats()
+            if not reconnect or self._stopping.is_set():
+                break
+            logger.warning("Video source %s ended; reopening in %.0fs", source, retry_delay)
+            self._stopping.wait(retry_delay)
+
+        # Make sure queued check-ins are committed before returning
+        self.db.flush(timeout=10.0)
+
+    def _make_governor(self) -> Optional[FrameRateGovernor]:
+        if not self.governor:
+            return None
+        return FrameRateGovernor(**self.governor_options)
+
+    def stop(self) -> None:
+        """Ask run() to finish; safe to call from a signal handler"""
+        self._stopping.set()
+        if self.pipeline is not None:
+            self.pipeline.running = False
+
+    def log_stats(self) -> None:
+        if self.pipeline is None:
+            return
+        governor = self.pipeline.governor
+        logger.info("capture %.1f fps, recognition %.1f fps, %d frames captured, %d skipped, %s, cpu %.0f%%",
+                    self.pipeline.capture_stats.fps, self.pipeline.recognition_stats.fps,
+                    self.pipeline.capture_stats.count, self.pipeline.dropped_frames,
+                    f"governor {governor.mode} ({governor.skipped} frames not recognised)" if governor else "no governor",
+                    self.pipeline.cpu.sample())
+        self.attendance.log_stats()
+
+    def process_recognitions(self, frame, faces) -> None:
+        """Pipeline callback; runs on the recognition thread"""
+        # Only full recognitions vote; tracked frames just move the faces
+        confirmed = self.voter.update(faces, fresh=self.tracker.last_frame_detected)
+        self.attendance.process_recognitions(confirmed)
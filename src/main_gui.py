@@ -1,12 +1,16 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import cv2
-from PIL import Image, ImageTk
-import threading
 import os
+import queue
 from datetime import datetime, date
 from src.database import Database
-from src.simple_face_recognition import SimpleFaceRecognizer
+from src.simple_face_recognition import SimpleFaceRecognizer, face_size_range
+from src.video_pipeline import FrameRateGovernor, VideoPipeline
+from src.frame_display import TkFrameDisplay
+from src.face_tracker import TrackingRecognizer
+from src.identity_voting import IdentityVoter
+from src.cooldown_cache import ACTIONS_BY_STATUS, CooldownCache
 
 class AttendanceSystemGUI:
     def __init__(self, root):
@@ -17,17 +21,30 @@ class AttendanceSystemGUI:
         
         # Initialize components
         self.db = Database()
-        self.face_recognizer = SimpleFaceRecognizer()
+        # Detect at half resolution; face size limits are set once the camera is open
+        self.face_recognizer = SimpleFaceRecognizer(detection_scale=0.5)
         
         # Camera variables
         self.cap = None
         self.camera_running = False
-        self.video_thread = None
+        self.pipeline = None
+        self.tracker = None
+        # A face must be recognised in 2 of its last 3 full recognitions
+        # before attendance is marked, so one noisy frame cannot check anyone in
+        self.recent_actions = CooldownCache(default=10.0)
+        self.voter = IdentityVoter(min_votes=2, window=3, threshold=0.6)
         
         # UI variables
         self.current_frame = None
         
+        # Finished writes are handed from the database writer thread to the
+        # Tk main loop here; the writer never calls Tk itself
+        self.committed_writes = queue.Queue()
+        
         self.setup_ui()
+        # Camera frames are pasted into one PhotoImage at up to 30 fps
+        self.display = TkFrameDisplay(self.root, self.camera_label, size=(800, 600), max_fps=30)
+        self.poll_after_id = self.root.after(100, self.poll_committed_writes)
     
     def setup_ui(self):
         """Setup the main UI"""
@@ -307,130 +324,132 @@ class AttendanceSystemGUI:
             messagebox.showerror("Error", "Could not open camera")
             return
         
+        # Only look for faces of people standing 0.3-2 m from a 60 degree webcam
+        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        self.face_recognizer.min_face_size, self.face_recognizer.max_face_size = \
+            face_size_range(frame_width, 60, 0.3, 2.0)
+        
         self.camera_running = True
         self.start_camera_btn.config(state=tk.DISABLED)
         self.stop_camera_btn.config(state=tk.NORMAL)
         
-        # Start video thread
-        self.video_thread = threading.Thread(target=self.video_loop)
-        self.video_thread.daemon = True
-        self.video_thread.start()
+        # Capture, recognition and rendering each run on their own thread;
+        # faces are tracked between full detections, and recognition drops
+        # to 2 fps while nobody moves in front of the camera
+        self.tracker = TrackingRecognizer(self.face_recognizer)
+        self.voter.reset()
+        self.pipeline = VideoPipeline(self.cap, self.tracker,
+                                      on_results=self.process_recognitions,
+                                      on_render=self.render_frame,
+                                      governor=FrameRateGovernor(idle_fps=2.0))
+        self.pipeline.start()
+        self.display.start()
         
         self.status_var.set("Camera started - Looking for faces...")
     
     def stop_camera(self):
         """Stop the camera"""
         self.camera_running = False
-        if self.cap:
-            self.cap.release()
+        if self.pipeline:
+            # The capture stage releases the camera once it stops
+            self.pipeline.stop()
+            governor = self.pipeline.governor
+            print(f"Camera session: {governor.admitted} frames recognised, {governor.skipped} skipped "
+                  f"while idle, {self.pipeline.cpu.sample():.0f}% CPU")
+        self.display.stop()
         
         self.start_camera_btn.config(state=tk.NORMAL)
         self.stop_camera_btn.config(state=tk.DISABLED)
         self.camera_label.config(image='', text="Camera stopped")
         self.status_var.set("Camera stopped")
     
-    def video_loop(self):
-        """Main video processing loop"""
-        while self.camera_running:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
+    def process_recognitions(self, frame, recognized_faces):
+        """Recognition stage: mark attendance for faces confirmed across frames"""
+        confirmed = self.voter.update(recognized_faces, fresh=self.tracker.last_frame_detected)
+        for name, _, confidence in confirmed:
+            status, _, _ = self.get_employee_current_status(name)
+            self.mark_attendance_smart(name, status)
+    
+    def render_frame(self, frame, recognized_faces):
+        """Render stage: draw the latest recognitions and show the frame"""
+        # Draw rectangles and names
+        for name, (top, right, bottom, left), confidence in recognized_faces:
+            # Get employee status
+            status, time_in, time_out = None, None, None
+            if name != "Unknown":
+                status, time_in, time_out = self.get_employee_current_status(name)
             
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
+            # Draw rectangle around face
+            if name == "Unknown":
+                color = (0, 0, 255)  # Red for unknown
+            elif status == "checked_in":
+                color = (0, 255, 255)  # Yellow for checked in
+            elif status == "checked_out":
+                color = (0, 255, 0)  # Green for checked out
+            else:
+                color = (255, 0, 0)  # Blue for not present today
             
-            # Recognize faces
-            recognized_faces = self.face_recognizer.recognize_faces_in_frame(frame)
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
             
-            # Draw rectangles and names
-            for name, (top, right, bottom, left), confidence in recognized_faces:
-                # Get employee status
-                status, time_in, time_out = None, None, None
-                if name != "Unknown":
-                    status, time_in, time_out = self.get_employee_current_status(name)
-                
-                # Draw rectangle around face
-                if name == "Unknown":
-                    color = (0, 0, 255)  # Red for unknown
-                elif status == "checked_in":
-                    color = (0, 255, 255)  # Yellow for checked in
+            # Draw label with status
+            if name != "Unknown":
+                if status == "checked_in":
+                    label = f"{name} - IN ({time_in})"
                 elif status == "checked_out":
-                    color = (0, 255, 0)  # Green for checked out
+                    label = f"{name} - OUT ({time_out})"
                 else:
-                    color = (255, 0, 0)  # Blue for not present today
-                
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                
-                # Draw label with status
-                if name != "Unknown":
-                    if status == "checked_in":
-                        label = f"{name} - IN ({time_in})"
-                    elif status == "checked_out":
-                        label = f"{name} - OUT ({time_out})"
-                    else:
-                        label = f"{name} - Not marked today"
-                else:
-                    label = name
-                
-                # Calculate label background size
-                (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.5, 1)
-                cv2.rectangle(frame, (left, bottom - label_height - 10), (left + label_width + 10, bottom), color, cv2.FILLED)
-                cv2.putText(frame, label, (left + 5, bottom - 5), 
-                           cv2.FONT_HERSHEY_DUPLEX, 0.5, (255, 255, 255), 1)
-                
-                # Mark attendance for known faces with high confidence
-                if name != "Unknown" and confidence > 0.6:
-                    self.mark_attendance_smart(name, status)
-            
-            # Convert frame to PIL format for tkinter
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_pil = Image.fromarray(frame_rgb)
-            frame_pil = frame_pil.resize((800, 600), Image.Resampling.LANCZOS)
-            frame_tk = ImageTk.PhotoImage(frame_pil)
+                    label = f"{name} - Not marked today"
+            else:
+                label = name
             
-            # Update the label
-            self.camera_label.config(image=frame_tk, text='')
-            self.camera_label.image = frame_tk
-        
-        # Cleanup when loop ends
-        if self.cap:
-            self.cap.release()
+            # Calculate label background size
+            (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_DUPLEX, 0.5, 1)
+            cv2.rectangle(frame, (left, bottom - label_height - 10), (left + label_width + 10, bottom), color, cv2.FILLED)
+            cv2.putText(frame, label, (left + 5, bottom - 5), 
+                       cv2.FONT_HERSHEY_DUPLEX, 0.5, (255, 255, 255), 1)
+        
+        # Resized into reused buffers here, shown by the Tk main loop
+        self.display.show(frame)
     
     def mark_attendance_async(self, name):
-        """Mark attendance asynchronously (legacy method)"""
+        """Queue attendance on the database writer and update the UI when it commits"""
         try:
-            success = self.db.mark_attendance(name)
-            if success:
-                self.root.after(0, lambda: self.status_var.set(f"Attendance marked for {name}"))
-                self.root.after(0, self.refresh_today_attendance)
-                self.root.after(0, self.refresh_checked_in_list)
+            future = self.db.submit_attendance(name)
+            future.add_done_callback(lambda f: self.committed_writes.put((self.on_time_in_committed, name, f)))
         except Exception as e:
             print(f"Error marking attendance: {e}")
     
+    def poll_committed_writes(self):
+        """Handle attendance writes the database writer has finished; runs on the Tk main loop"""
+        self.poll_after_id = self.root.after(100, self.poll_committed_writes)
+        try:
+            while True:
+                handler, name, future = self.committed_writes.get_nowait()
+                handler(name, future)
+        except queue.Empty:
+            pass
+    
+    def on_time_in_committed(self, name, future):
+        """Refresh the views once a queued time-in has been written"""
+        if future.exception() is not None:
+            print(f"Error marking attendance: {future.exception()}")
+            return
+        if future.result():
+            self.status_var.set(f"Time IN marked for {name}")
+            self.refresh_today_attendance()
+            self.refresh_checked_in_list()
+    
     def mark_attendance_smart(self, name, current_status):
         """Smart attendance marking that only marks when appropriate"""
-        # Use a simple throttling mechanism to avoid multiple rapid marks
-        current_time = datetime.now()
-        
         # Only mark attendance every 10 seconds for the same person
-        if hasattr(self, '_last_recognition'):
-            if name in self._last_recognition:
-                time_diff = (current_time - self._last_recognition[name]).total_seconds()
-                if time_diff < 10:  # 10 second cooldown
-                    return
-        else:
-            self._last_recognition = {}
-        
-        self._last_recognition[name] = current_time
+        action = ACTIONS_BY_STATUS.get(current_status)
+        if not self.recent_actions.allow(name, action):
+            return
         
         try:
             if current_status == "not_present":
                 # First time today - mark time in
-                success = self.db.mark_attendance(name)
-                if success:
-                    self.root.after(0, lambda: self.status_var.set(f"Time IN marked for {name}"))
-                    self.root.after(0, self.refresh_today_attendance)
-                    self.root.after(0, self.refresh_checked_in_list)
+                self.mark_attendance_async(name)
             elif current_status == "checked_in":
                 # Already checked in - could auto mark time out after certain period
                 # For now, just update status to show they're still present
@@ -737,6 +756,9 @@ class AttendanceSystemGUI:
         """Handle application closing"""
         if self.camera_running:
             self.stop_camera()
+        self.root.after_cancel(self.poll_after_id)
+        # Commits any queued attendance writes before closing
+        self.db.close()
         self.root.destroy()
 
 def main():
@@ -0,0 +1,220 @@
+"""
+Facial Recognition Attendance System - Multi-Camera Module
+Author: Uzman Jawaid
+Description: Several capture sources sharing one recognition worker pool
+Version: 2.0
+Date: August 2025
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional, Union
+import numpy as np
+
+from src.face_gallery import FaceGallery
+from src.identity_voting import IdentityVoter
+from src.kiosk_service import KioskAttendance, open_source
+from src.recognition_workers import init_worker, recognize
+from src.video_pipeline import CpuMeter, FrameRateGovernor, StageCounter
+
+logger = logging.getLogger("attendance.cameras")
+
+
+class SharedGallery:
+    """
+    Publishes a FaceGallery's template matrix in a shared memory block so
+    every recognition worker matches against the same physical copy. The
+    matrix is read-only for the workers; the publisher unlinks the block
+    in close().
+    """
+
+    def __init__(self, gallery: FaceGallery):
+        matrix = np.ascontiguousarray(gallery.matrix, dtype=np.float32)
+        self.names = list(gallery.names)
+        self.shape = matrix.shape
+        self.top_k = gallery.top_k
+        self.memory = shared_memory.SharedMemory(create=True, size=max(1, matrix.nbytes))
+        np.ndarray(self.shape, dtype=np.float32, buffer=self.memory.buf)[:] = matrix
+
+    def descriptor(self) -> dict:
+        """What a worker needs to attach: pass it through the pool initializer"""
+        return {'memory': self.memory.name, 'shape': self.shape, 'names': self.names, 'top_k': self.top_k}
+
+    @staticmethod
+    def attach(descriptor: dict):
+        """
+        Map a published gallery in a worker
+        Returns: Tuple (FaceGallery viewing the shared matrix, SharedMemory to keep alive)
+        """
+        memory = shared_memory.SharedMemory(name=descriptor['memory'])
+        matrix = np.ndarray(descriptor['shape'], dtype=np.float32, buffer=memory.buf)
+        matrix.flags.writeable = False
+        gallery = FaceGallery(top_k=descriptor['top_k'])
+        gallery.attach(descriptor['names'], matrix)
+        return gallery, memory
+
+    def close(self) -> None:
+        self.memory.close()
+        try:
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach_gallery(recognizer, gallery_descriptor):
+    # The returned SharedMemory must outlive the worker's use of the gallery
+    recognizer.gallery, memory = SharedGallery.attach(gallery_descriptor)
+    return memory
+
+
+class CameraFeed:
+    """One capture source with its own throughput counters and identity votes"""
+
+    def __init__(self, name: str, source: Union[int, str], voter: IdentityVoter,
+                 governor: Optional[FrameRateGovernor] = None):
+        self.name = name
+        self.source = source
+        self.voter = voter
+        self.governor = governor
+        self.capture = None
+        self.capture_stats = StageCounter()
+        self.recognition_stats = StageCounter()
+        self.dropped = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+
+
+class MultiCameraService:
+    """
+    One process serving several entrances.
+
+    Each camera is read on its own thread (OpenCV releases the GIL while
+    decoding) and its frames are recognised by a shared pool of worker
+    processes. The gallery lives once in shared memory instead of once per
+    camera. A camera never has more than max_in_flight frames queued for
+    the pool; newer frames are dropped while it waits, so a busy entrance
+    cannot starve the others. Each camera's FrameRateGovernor (unless
+    governor is False) keeps an empty entrance from occupying the pool at
+    all. Each camera votes on its own faces like the kiosk (min_votes of
+    the last vote_window recognitions), and the confirmed ones go through
+    one KioskAttendance and therefore one Database writer.
+    """
+
+    def __init__(self, recognizer, db, sources: List[Union[int, str]], workers: Optional[int] = None,
+                 recognizer_kwargs: Optional[dict] = None, min_confidence: float = 0.5,
+                 cooldown: float = 15.0, max_in_flight: int = 2, governor: bool = True,
+                 governor_options: Optional[dict] = None, check_out_cooldown: Optional[float] = None,
+                 min_votes: int = 2, vote_window: int = 3):
+        self.recognizer = recognizer
+        self.db = db
+        self.cameras = [CameraFeed(f"camera {i + 1}", source,
+                                   IdentityVoter(min_votes, vote_window, threshold=min_confidence),
+                                   FrameRateGovernor(**(governor_options or {})) if governor else None)
+                        for i, source in enumerate(sources)]
+        self.workers = workers or os.cpu_count() or 1
+        self.recognizer_kwargs = dict(recognizer_kwargs or {})
+        self.attendance = KioskAttendance(db, min_confidence, cooldown, check_out_cooldown)
+        self.max_in_flight = max_in_flight
+        self.cpu = CpuMeter()
+
+        self.running = False
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.shared_gallery: Optional[SharedGallery] = None
+        self._stopping = threading.Event()
+
+    def run(self, stats_interval: float = 30.0) -> None:
+        """Serve every camera until all sources end or stop() is called"""
+        self.shared_gallery = SharedGallery(self.recognizer.gallery)
+        logger.info("Sharing %d templates with %d recognition workers", len(self.shared_gallery.names), self.workers)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                        initargs=(type(self.recognizer), self.recognizer_kwargs,
+                                                  _attach_gallery, self.shared_gallery.descriptor()))
+        self.running = True
+        self._stopping.clear()
+        try:
+            for camera in self.cameras:
+                camera.capture = open_source(camera.source)
+                logger.info("%s reading frames from %s", camera.name, camera.source)
+                camera.thread = threading.Thread(target=self._capture_loop, args=(camera,), daemon=True)
+                camera.thread.start()
+
+            next_report = time.monotonic() + stats_interval
+            while not self._stopping.is_set() and any(c.thread.is_alive() for c in self.cameras):
+                self._stopping.wait(0.5)
+                if time.monotonic() >= next_report:
+                    self.log_stats()
+                    next_report = time.monotonic() + stats_interval
+        finally:
+            self.running = False
+            for camera in self.cameras:
+                if camera.thread is not None:
+                    camera.thread.join(2.0)
+            self.pool.shutdown(wait=True)
+            self.shared_gallery.close()
+            self.log_stats()
+            self.db.flush(timeout=10.0)
+
+    def stop(self) -> None:
+        """Ask run() to finish; safe to call from a signal handler"""
+        self._stopping.set()
+        self.running = False
+
+    def _capture_loop(self, camera: CameraFeed) -> None:
+        try:
+            while self.running:
+                ret, frame = camera.capture.read()
+                if not ret:
+                    break
+                camera.capture_stats.tick()
+                if camera.governor is not None and not camera.governor.admit(frame):
+                    continue
+
+                with camera.lock:
+                    if camera.in_flight >= self.max_in_flight:
+                        camera.dropped += 1
+                        continue
+                    camera.in_flight += 1
+                future = self.pool.submit(recognize, frame)
+                future.add_done_callback(lambda f, camera=camera: self._on_results(camera, f))
+        except Exception as e:
+            logger.error("%s capture failed: %s", camera.name, e)
+        finally:
+            camera.capture.release()
+            logger.info("%s stopped", camera.name)
+
+    def _on_results(self, camera: CameraFeed, future) -> None:
+        with camera.lock:
+            camera.in_flight -= 1
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error("Recognition failed for %s: %s", camera.name, future.exception())
+            return
+        camera.recognition_stats.tick()
+        faces = future.result()
+        if camera.governor is not None:
+            camera.governor.observe(faces)
+        # Every worker result is a full recognition, so each one votes
+        with camera.lock:
+            confirmed = camera.voter.update(faces)
+        try:
+            self.attendance.process_recognitions(confirmed, camera.name)
+        except Exception as e:
+            logger.error("Attendance failed for %s: %s", camera.name, e)
+
+    def log_stats(self) -> None:
+        for camera in self.cameras:
+            governor = camera.governor
+            logger.info("%s: capture %.1f fps, recognition %.1f fps, %d recognised, %d dropped, %s",
+                        camera.name, camera.capture_stats.fps, camera.recognition_stats.fps,
+                        camera.recognition_stats.count, camera.dropped,
+                        f"governor {governor.mode} ({governor.skipped} frames not recognised)"
+                        if governor else "no governor")
+        # Capture and dispatch only; the worker processes are not included
+        logger.info("capture process cpu %.0f%%", self.cpu.sample())
+        self.attendance.log_stats()
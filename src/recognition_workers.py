@@ -0,0 +1,40 @@
+"""
+Facial Recognition Attendance System - Recognition Workers Module
+Author: Uzman Jawaid
+Description: Per-process recognizers for ProcessPoolExecutor worker pools
+Version: 2.0
+Date: August 2025
+"""
+
+import contextlib
+import io
+from typing import Any, Callable, Optional
+
+# Recognizer owned by each worker process, created once by init_worker
+_worker_recognizer = None
+# Whatever the setup callable returned, kept alive for the worker's lifetime
+_worker_state = None
+
+
+def init_worker(recognizer_class, recognizer_kwargs: dict,
+                setup: Optional[Callable[[Any, Any], Any]] = None, setup_arg: Any = None) -> None:
+    """
+    Pool initializer: build this worker's recognizer without loading the
+    template store, then call setup(recognizer, setup_arg) to give it the
+    parent's templates. setup must be a module-level function so it can be
+    pickled.
+    """
+    global _worker_recognizer, _worker_state
+    # Keep recognizer messages out of the parent's progress output
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_recognizer = recognizer_class(**dict(recognizer_kwargs, load_templates=False))
+    if setup is not None:
+        _worker_state = setup(_worker_recognizer, setup_arg)
+
+
+def worker_recognizer():
+    return _worker_recognizer
+
+
+def recognize(frame):
+    return _worker_recognizer.recognize_faces_in_frame(frame)
@@ -7,11 +7,40 @@ Date: August 2025
 """
 
 import cv2
+import math
 import numpy as np
 import os
 import pickle
-from typing import List, Tuple, Optional
-import hashlib
+from typing import Dict, List, Tuple, Optional
+from src.face_detectors import make_detector
+from src.face_gallery import FaceGallery
+from src.feature_cache import FeatureCache
+from src.template_store import TemplateStore
+
+
+def face_size_range(frame_width: int, horizontal_fov: float, nearest_distance: float,
+                    farthest_distance: float, face_width: float = 0.16) -> Tuple[int, int]:
+    """
+    Expected face width in pixels for a kiosk camera, from a pinhole model
+    frame_width: Camera frame width in pixels
+    horizontal_fov: Horizontal field of view in degrees
+    nearest_distance, farthest_distance: Where people stand, in metres
+    face_width: Typical face width in metres
+    Returns: Tuple (min_face_size, max_face_size) in pixels
+    """
+    focal_length = (frame_width / 2) / math.tan(math.radians(horizontal_fov) / 2)
+    return (int(focal_length * face_width / farthest_distance),
+            int(math.ceil(focal_length * face_width / nearest_distance)))
+
+
+# Uniform LBP: the 58 patterns with at most two 0/1 transitions get their own bin, all others share bin 58
+_LBP_UNIFORM_BINS = 59
+_LBP_UNIFORM_LOOKUP = np.full(256, _LBP_UNIFORM_BINS - 1, dtype=np.int64)
+_LBP_UNIFORM_LOOKUP[[code for code in range(256)
+                     if bin(code ^ ((code >> 1) | ((code & 1) << 7))).count('1') <= 2]] = np.arange(58)
+# Neighbour offsets (dy, dx) clockwise from the top-left; bit i is set when neighbour i >= centre
+_LBP_NEIGHBOURS = ((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))
+
 
 class SimpleFaceRecognizer:
     """
@@ -20,37 +49,232 @@ class SimpleFaceRecognizer:
     more advanced face recognition libraries when available.
     """
     
-    def __init__(self, model_path="models/face_templates.pkl"):
+    # Feature version of each feature type, stored with every template; bump one
+    # whenever its extractor changes output. The feature cache also appends the detector name.
+    FEATURE_VERSIONS = {
+        'histogram': "hist256-v1",
+        'lbp': "lbp-u2-7x7-v1",
+    }
+    # Templates saved before versioning were all global histograms
+    LEGACY_FEATURE_VERSION = "hist256-v1"
+    LBP_GRID = 7
+    
+    def __init__(self, model_path="models/templates", match_threshold=0.6,
+                 legacy_model_path="models/face_templates.pkl", match_top_k=1,
+                 feature_cache_path="models/feature_cache",
+                 detection_scale=1.0, min_face_size=None, max_face_size=None, roi=None,
+                 detector="haar", feature_type="histogram", faces_dir="data/faces",
+                 load_templates=True):
+        """
+        load_templates: Load the gallery from the store; False for workers given a shared gallery
+        feature_type: "histogram" (global grey-level histogram) or "lbp" (spatial uniform-LBP histograms)
+        faces_dir: Saved enrollment photos, used to rebuild templates of another feature version
+        detector: Detection backend name ("haar", "lbp", "hog", "ssd", "yunet") or a FaceDetector
+        detection_scale: Fraction of the frame resolution that live detection runs at
+        min_face_size, max_face_size: Face width limits in full-frame pixels (see face_size_range)
+        roi: Optional (x, y, w, h) region of live frames to search, e.g. the area in front of the kiosk
+        """
         self.model_path = model_path
-        self.face_templates = {}
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.load_face_templates()
+        self.legacy_model_path = legacy_model_path
+        self.match_threshold = match_threshold
+        self.match_top_k = match_top_k
+        self.store = TemplateStore(model_path)
+        self.gallery = FaceGallery(top_k=match_top_k)
+        if feature_type not in self.FEATURE_VERSIONS:
+            raise ValueError(f"Unknown feature type '{feature_type}', choose from {', '.join(self.FEATURE_VERSIONS)}")
+        self.feature_type = feature_type
+        self.template_version = self.FEATURE_VERSIONS[feature_type]
+        self.faces_dir = faces_dir
+        self.stale_names: List[str] = []
+        # Store rows of other feature versions (names, padded matrix, versions, lengths),
+        # kept so snapshots written by this recognizer do not drop them
+        self.other_templates = ([], np.empty((0, 0), dtype=np.float32), [], [])
+        self.detector = make_detector(detector)
+        self.feature_version = f"{self.template_version}-{self.detector.name}"
+        self.feature_cache = FeatureCache(feature_cache_path, self.feature_version) if feature_cache_path else None
+        self.detection_scale = detection_scale
+        self.min_face_size = min_face_size
+        self.max_face_size = max_face_size
+        self.roi = roi
+        if load_templates:
+            self.load_face_templates()
     
     def load_face_templates(self):
-        """Load face templates from pickle file"""
-        if os.path.exists(self.model_path):
+        """Load face templates from the memory-mapped template store"""
+        if not self.store.exists() and self.legacy_model_path and os.path.exists(self.legacy_model_path):
+            self.migrate_legacy_templates()
+        
+        if self.store.exists():
             try:
-                with open(self.model_path, 'rb') as f:
-                    self.face_templates = pickle.load(f)
-                print(f"Loaded {len(self.face_templates)} face templates")
+                names, matrix, versions, lengths = self.store.load_versioned()
+                current = np.array([(version or self.LEGACY_FEATURE_VERSION) == self.template_version
+                                    for version in versions], dtype=bool)
+                if current.all() and all(length == matrix.shape[1] for length in lengths):
+                    self.gallery.attach(names, matrix)
+                else:
+                    # Templates of another feature version cannot be compared with this extractor's,
+                    # but stay in the store for the recognizers that use them
+                    dim = next((length for length, ok in zip(lengths, current) if ok), 0)
+                    self.gallery.attach([n for n, ok in zip(names, current) if ok],
+                                        np.ascontiguousarray(matrix[current][:, :dim]))
+                    other = ~current
+                    self.other_templates = ([n for n, ok in zip(names, other) if ok], np.array(matrix[other]),
+                                            [v for v, ok in zip(versions, other) if ok],
+                                            [length for length, ok in zip(lengths, other) if ok])
+                    self.stale_names = [n for n in dict.fromkeys(self.other_templates[0]) if n not in self.gallery]
+                print(f"Loaded {len(self.gallery)} face templates")
             except Exception as e:
                 print(f"Error loading face templates: {e}")
-                self.face_templates = {}
+                self.gallery = FaceGallery(top_k=self.match_top_k)
+            if self.stale_names:
+                # Loading never writes to the shared store; rebuilding is an explicit step
+                print(f"{len(self.stale_names)} people only have templates of another feature version; "
+                      f"run 'python enroll.py --rebuild-stale --feature-type {self.feature_type}' to add "
+                      f"{self.template_version} templates from their saved photos")
         else:
             print("No existing face templates found")
     
+    def export_templates(self):
+        """The gallery as (names, matrix), e.g. to hand to worker processes"""
+        return list(self.gallery.names), self.gallery.matrix
+    
+    def attach_templates(self, names, matrix):
+        """Match against templates loaded elsewhere instead of reading the store"""
+        self.gallery.attach(names, matrix)
+    
+    def rebuild_stale_templates(self) -> List[str]:
+        """
+        Re-extract templates of another feature version from the saved enrollment
+        photos in faces_dir (cheap when their features are cached) and save them
+        in one write. People without photos must be enrolled again.
+        Returns: Names that could not be rebuilt
+        """
+        print(f"Rebuilding {self.template_version} templates for {len(self.stale_names)} people")
+        templates, missing = {}, []
+        for name in self.stale_names:
+            person_dir = os.path.join(self.faces_dir, name)
+            samples = []
+            if os.path.isdir(person_dir):
+                for filename in sorted(os.listdir(person_dir)):
+                    if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                        features, _ = self.encode_image_file(os.path.join(person_dir, filename))
+                        if features is not None:
+                            samples.append(features)
+            if samples:
+                templates[name] = np.stack(samples)
+            else:
+                missing.append(name)
+        
+        if templates:
+            self.enroll_batch(templates)
+        if missing:
+            print(f"No usable photos to rebuild templates for: {', '.join(missing)}; please re-register them")
+        self.stale_names = missing
+        return missing
+    
+    def migrate_legacy_templates(self) -> bool:
+        """One-shot conversion of the old face_templates.pkl into the template store"""
+        try:
+            with open(self.legacy_model_path, 'rb') as f:
+                face_templates = pickle.load(f)
+            
+            names = list(face_templates.keys())
+            gallery = FaceGallery()
+            gallery.build(names, [face_templates[name]['features'] for name in names])
+            self.store.save(gallery.names, gallery.matrix, [self.LEGACY_FEATURE_VERSION] * len(names))
+            
+            # Keep the pickle as a backup but stop loading it
+            os.replace(self.legacy_model_path, self.legacy_model_path + ".migrated")
+            print(f"Migrated {len(names)} face templates from {self.legacy_model_path}")
+            return True
+        except Exception as e:
+            print(f"Error migrating face templates: {e}")
+            return False
+    
     def save_face_templates(self):
-        """Save face templates to pickle file"""
-        os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
+        """Write a full snapshot of the face templates and empty the journal"""
         try:
-            with open(self.model_path, 'wb') as f:
-                pickle.dump(self.face_templates, f)
+            self.store.compact(self._gallery_snapshot)
             print("Face templates saved successfully")
         except Exception as e:
             print(f"Error saving face templates: {e}")
     
+    def _gallery_snapshot(self):
+        other_names, other_matrix, other_versions, other_lengths = self.other_templates
+        dim = self.gallery.matrix.shape[1] if self.gallery.matrix.ndim == 2 else 0
+        matrix, lengths = TemplateStore.stack_rows([(other_matrix, other_lengths),
+                                                    (self.gallery.matrix, [dim] * len(self.gallery))])
+        return (other_names + list(self.gallery.names), matrix,
+                other_versions + [self.template_version] * len(self.gallery), lengths)
+    
+    def _delete_stored(self, name: str):
+        """Journal the removal of name's templates of this feature version only"""
+        if name in self.other_templates[0]:
+            self.store.delete(name, self.template_version)
+        else:
+            # Also covers unversioned rows written before feature versions existed
+            self.store.delete(name)
+    
+    def _store_template(self, name: str, features):
+        """
+        Add or replace a person's templates (one feature vector or one row per
+        sample) and journal the change instead of rewriting the store
+        """
+        with self.store.lock:
+            if name in self.gallery:
+                self._delete_stored(name)
+            added = self.gallery.add(name, features)
+            for row in self.gallery.matrix[-added:]:
+                self.store.append(name, row, self.template_version)
+        self._compact_if_needed()
+    
+    def enroll_batch(self, templates: Dict[str, np.ndarray]):
+        """Set the templates of many people and write them as one new store generation"""
+        with self.store.lock:
+            self.gallery.add_many(templates)
+            self.store.save(*self._gallery_snapshot())
+    
+    def _compact_if_needed(self):
+        if self.store.needs_compaction(len(self.gallery)):
+            self.store.compact(self._gallery_snapshot, background=True)
+    
+    def detect_faces(self, image, live: bool = True) -> np.ndarray:
+        """
+        Detect faces in a BGR or grayscale image with the configured backend
+        Live frames are searched only inside the ROI, at detection_scale and
+        within the face size limits; stills (enrollment photos) in full.
+        Returns: Array of (x, y, w, h) boxes in full-frame coordinates
+        """
+        if not live:
+            return self.detector.detect(image)
+        
+        offset_x, offset_y = 0, 0
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            offset_x, offset_y = max(0, x), max(0, y)
+            image = image[offset_y:y+h, offset_x:x+w]
+            if image.size == 0:
+                return np.empty((0, 4), dtype=np.int32)
+        
+        # Detection cost scales with pixel count, so search a downscaled copy
+        scale = self.detection_scale
+        if scale != 1.0:
+            image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        min_size = max(1, int(self.min_face_size * scale)) if self.min_face_size else None
+        max_size = int(math.ceil(self.max_face_size * scale)) if self.max_face_size else None
+        faces = self.detector.detect(image, min_size, max_size)
+        if len(faces) == 0:
+            return faces
+        
+        # Map boxes back to full-frame coordinates
+        faces = np.round(faces / scale).astype(np.int32)
+        faces[:, 0] += offset_x
+        faces[:, 1] += offset_y
+        return faces
+    
     def extract_face_features(self, face_roi):
-        """Extract simple features from face ROI"""
+        """Extract features of the configured feature_type from face ROI"""
         # Resize to standard size
         face_roi = cv2.resize(face_roi, (100, 100))
         
@@ -58,6 +282,9 @@ class SimpleFaceRecognizer:
         if len(face_roi.shape) == 3:
             face_roi = cv2.cvtColor(face_roi, cv2.COLOR_BGR2GRAY)
         
+        if self.feature_type == 'lbp':
+            return self.extract_lbp_features(face_roi)
+        
         # Calculate histogram as a simple feature
         hist = cv2.calcHist([face_roi], [0], None, [256], [0, 256])
         hist = hist.flatten()
@@ -67,49 +294,80 @@ class SimpleFaceRecognizer:
         
         return hist
     
+    def extract_lbp_features(self, face_roi):
+        """
+        Uniform LBP histograms over a LBP_GRID x LBP_GRID grid of a 100x100
+        grayscale face, concatenated. Unlike a global histogram this keeps
+        where each texture occurs. Cells are square-rooted (Hellinger) so the
+        correlation computed by the gallery behaves like a kernel on them.
+        """
+        face = face_roi.astype(np.int16)
+        center = face[1:-1, 1:-1]
+        height, width = center.shape
+        
+        # One whole-image comparison per neighbour builds every 8-bit code at once
+        codes = np.zeros(center.shape, dtype=np.int64)
+        for bit, (dy, dx) in enumerate(_LBP_NEIGHBOURS):
+            neighbour = face[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+            codes |= (neighbour >= center).astype(np.int64) << bit
+        
+        grid = self.LBP_GRID
+        cell_rows = np.minimum(np.arange(height) * grid // height, grid - 1)
+        cell_cols = np.minimum(np.arange(width) * grid // width, grid - 1)
+        cells = cell_rows[:, np.newaxis] * grid + cell_cols[np.newaxis, :]
+        
+        hist = np.bincount((cells * _LBP_UNIFORM_BINS + _LBP_UNIFORM_LOOKUP[codes]).ravel(),
+                           minlength=grid * grid * _LBP_UNIFORM_BINS).reshape(grid * grid, _LBP_UNIFORM_BINS)
+        hist = hist / np.maximum(hist.sum(axis=1, keepdims=True), 1)
+        return np.sqrt(hist).astype(np.float32).ravel()
+    
     def compare_faces(self, features1, features2):
         """Compare two face feature vectors"""
         # Use correlation coefficient as similarity measure
         correlation = cv2.compareHist(features1, features2, cv2.HISTCMP_CORREL)
         return correlation
     
+    def encode_image_file(self, image_path: str) -> Tuple[Optional[np.ndarray], str]:
+        """
+        Detect the single face in an image file and extract its features,
+        reusing the cached result when the same image was seen before
+        Returns: Tuple (features, message); features is None when the image is unusable
+        """
+        if self.feature_cache is not None:
+            return self.feature_cache.lookup(image_path, self._encode_image_file)
+        return self._encode_image_file(image_path)
+    
+    def _encode_image_file(self, image_path: str) -> Tuple[Optional[np.ndarray], str]:
+        # Load the image
+        image = cv2.imread(image_path)
+        if image is None:
+            return None, "Could not load image"
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        # Detect faces anywhere in the photo
+        faces = self.detect_faces(image, live=False)
+        
+        if len(faces) == 0:
+            return None, "No face found in the image"
+        
+        if len(faces) > 1:
+            return None, "Multiple faces found. Please use an image with only one face"
+        
+        # Extract features from the face ROI
+        x, y, w, h = faces[0]
+        return self.extract_face_features(gray[y:y+h, x:x+w]), "ok"
+    
     def add_new_face(self, image_path: str, name: str) -> bool:
         """Add a new face to the templates database"""
         try:
-            # Load the image
-            image = cv2.imread(image_path)
-            if image is None:
-                print("Could not load image")
-                return False
-            
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
-            
-            if len(faces) == 0:
-                print("No face found in the image")
-                return False
-            
-            if len(faces) > 1:
-                print("Multiple faces found. Please use an image with only one face")
+            features, message = self.encode_image_file(image_path)
+            if features is None:
+                print(message)
                 return False
             
-            # Extract face ROI
-            x, y, w, h = faces[0]
-            face_roi = gray[y:y+h, x:x+w]
-            
-            # Extract features
-            features = self.extract_face_features(face_roi)
-            
             # Store template
-            self.face_templates[name] = {
-                'features': features,
-                'face_roi': face_roi
-            }
-            
-            # Save templates
-            self.save_face_templates()
+            self._store_template(name, features)
             print(f"Successfully added face template for {name}")
             return True
             
@@ -124,26 +382,19 @@ class SimpleFaceRecognizer:
         """
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
-        # Detect faces
-        faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+        # Detect faces in the ROI at detection resolution; features come from the full-resolution frame
+        faces = self.detect_faces(frame)
         
-        recognized_faces = []
+        if len(faces) == 0:
+            return []
         
-        for (x, y, w, h) in faces:
-            face_roi = gray[y:y+h, x:x+w]
-            face_features = self.extract_face_features(face_roi)
-            
-            best_match = "Unknown"
-            best_confidence = 0
-            
-            # Compare with all templates
-            for name, template in self.face_templates.items():
-                confidence = self.compare_faces(face_features, template['features'])
-                
-                if confidence > best_confidence and confidence > 0.6:  # Threshold
-                    best_confidence = confidence
-                    best_match = name
-            
+        # Score every face in the frame against the whole gallery at once
+        face_features = np.stack([self.extract_face_features(gray[y:y+h, x:x+w])
+                                  for (x, y, w, h) in faces])
+        matches = self.gallery.match(face_features, self.match_threshold)
+        
+        recognized_faces = []
+        for (x, y, w, h), (best_match, best_confidence) in zip(faces, matches):
             # Convert to expected format (top, right, bottom, left)
             recognized_faces.append((best_match, (y, x+w, y+h, x), best_confidence))
         
@@ -178,7 +429,7 @@ class SimpleFaceRecognizer:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
             
             # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+            faces = self.detect_faces(frame)
             
             # Draw rectangles around detected faces
             display_frame = frame.copy()
@@ -219,14 +470,9 @@ class SimpleFaceRecognizer:
         cap.release()
         cv2.destroyAllWindows()
         
-        # Average the templates
+        # Keep every sample so pose and lighting variation is matched too
         if templates:
-            avg_template = np.mean(templates, axis=0)
-            self.face_templates[name] = {
-                'features': avg_template,
-                'face_roi': None  # We don't need to store the ROI for averaged templates
-            }
-            self.save_face_templates()
+            self._store_template(name, np.stack(templates))
             print(f"Successfully processed {len(templates)} photos for {name}")
             return True
         else:
@@ -234,10 +480,18 @@ class SimpleFaceRecognizer:
             return False
     
     def remove_person(self, name: str) -> bool:
-        """Remove a person from the templates database"""
-        if name in self.face_templates:
-            del self.face_templates[name]
-            self.save_face_templates()
+        """Remove a person's templates of every feature version from the templates database"""
+        with self.store.lock:
+            other_names, other_matrix, other_versions, other_lengths = self.other_templates
+            keep = [i for i, other in enumerate(other_names) if other != name]
+            removed = self.gallery.remove(name) | (len(keep) < len(other_names))
+            if removed:
+                self.store.delete(name)
+                self.other_templates = ([other_names[i] for i in keep], other_matrix[keep],
+                                        [other_versions[i] for i in keep], [other_lengths[i] for i in keep])
+                self.stale_names = [n for n in self.stale_names if n != name]
+        if removed:
+            self._compact_if_needed()
             print(f"Removed {name} from database")
             return True
         else:
@@ -246,4 +500,4 @@ class SimpleFaceRecognizer:
     
     def get_known_names(self) -> List[str]:
         """Get list of all known person names"""
-        return list(self.face_templates.keys())
+        return self.gallery.known_names()
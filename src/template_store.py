@@ -0,0 +1,321 @@
+"""
+Facial Recognition Attendance System - Template Store Module
+Author: Uzman Jawaid
+Description: Memory-mapped binary storage for face template matrices
+Version: 2.0
+Date: August 2025
+"""
+
+import json
+import os
+import struct
+import threading
+import zlib
+import numpy as np
+from typing import Callable, List, Optional, Tuple
+
+
+class TemplateStore:
+    """
+    Stores a gallery as a binary .npy feature matrix plus a JSON name index.
+    The matrix is opened with mmap, so loading costs a header read no matter
+    how many templates are enrolled; pages are only pulled in when matched.
+
+    Changes between snapshots go to an append-only journal of add/delete
+    records, so enrolling one person writes one record instead of the whole
+    gallery. Loading replays the journal on top of the snapshot, and
+    compaction folds it into a new snapshot generation. The index names the
+    generation, so a crash mid-save never leaves a half-written gallery or a
+    journal that gets applied twice.
+
+    Every row carries the feature version it was extracted with, so a
+    recognizer can tell templates it can match from ones it must rebuild.
+    Rows written before versioning have version None. Recognizers with
+    different feature types can share a store: rows of every version are
+    kept, zero-padded to the widest row, with their true lengths in the
+    index.
+    """
+
+    INDEX_FILE = "index.json"
+    FORMAT_VERSION = 1
+
+    OP_ADD = 1
+    OP_DELETE = 2
+    # Like OP_ADD and OP_DELETE, with "name\0version" in the name field
+    OP_ADD_VERSIONED = 3
+    OP_DELETE_VERSIONED = 4
+    # op, name length, vector length
+    RECORD_HEADER = struct.Struct('<BHI')
+    RECORD_CRC = struct.Struct('<I')
+
+    def __init__(self, directory="models/templates", compact_min_records=256, compact_ratio=0.5):
+        self.directory = directory
+        self.index_path = os.path.join(directory, self.INDEX_FILE)
+        self.compact_min_records = compact_min_records
+        self.compact_ratio = compact_ratio
+        self.generation = 0
+        self.journal_records = 0
+        # Held by callers around "mutate gallery + journal it" so compaction never misses a record
+        self.lock = threading.RLock()
+        self._compacting = False
+
+    def exists(self) -> bool:
+        """Check whether a store has been written to the directory"""
+        return os.path.exists(self.index_path) or os.path.exists(self._journal_path(0))
+
+    def _read_index(self) -> dict:
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _journal_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"journal-{generation:08d}.bin")
+
+    def load(self) -> Tuple[List[str], np.ndarray]:
+        """
+        Load the snapshot and replay the journal on top of it
+        Returns: Tuple (names, matrix) where matrix rows line up with names.
+        With an empty journal the matrix is a read-only memory map.
+        """
+        names, matrix, _, lengths = self.load_versioned()
+        if any(length != matrix.shape[1] for length in lengths):
+            raise ValueError("Template store holds rows of different lengths; use load_versioned()")
+        return names, matrix
+
+    def load_versioned(self) -> Tuple[List[str], np.ndarray, List[Optional[str]], List[int]]:
+        """
+        Like load(), plus the feature version and length of every row
+        Returns: Tuple (names, matrix, versions, lengths); rows shorter than
+        the matrix are zero-padded and only their first length values are features
+        """
+        with self.lock:
+            names, matrix = [], np.empty((0, 0), dtype=np.float32)
+            versions, lengths = [], []
+            self.generation = 0
+            if os.path.exists(self.index_path):
+                index = self._read_index()
+                self.generation = index.get('generation', 0)
+                names = index['names']
+                versions = index.get('versions') or [None] * len(names)
+                if names:
+                    matrix = np.load(os.path.join(self.directory, index['features']), mmap_mode='r')
+                    if matrix.shape[0] != len(names):
+                        raise ValueError(f"Template index lists {len(names)} names "
+                                         f"but the feature matrix has {matrix.shape[0]} rows")
+                else:
+                    matrix = np.empty((0, index.get('dim', 0)), dtype=np.float32)
+                lengths = index.get('lengths') or [matrix.shape[1]] * len(names)
+
+            records = self._read_journal()
+            self.journal_records = len(records)
+            if not records:
+                return names, matrix, versions, lengths
+            return self._replay(names, matrix, versions, lengths, records)
+
+    def _read_journal(self) -> List[Tuple[int, str, Optional[np.ndarray], Optional[str]]]:
+        """Read journal records, truncating a torn or corrupt tail left by a crash"""
+        path = self._journal_path(self.generation)
+        if not os.path.exists(path):
+            return []
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        records = []
+        offset = 0
+        header_size = self.RECORD_HEADER.size
+        while offset + header_size <= len(data):
+            op, name_len, dim = self.RECORD_HEADER.unpack_from(data, offset)
+            end = offset + header_size + name_len + dim * 4 + self.RECORD_CRC.size
+            if end > len(data):
+                break
+            body = data[offset:end - self.RECORD_CRC.size]
+            (crc,) = self.RECORD_CRC.unpack_from(data, end - self.RECORD_CRC.size)
+            if crc != zlib.crc32(body) or op not in (self.OP_ADD, self.OP_DELETE,
+                                                     self.OP_ADD_VERSIONED, self.OP_DELETE_VERSIONED):
+                break
+
+            name_start = offset + header_size
+            name = data[name_start:name_start + name_len].decode('utf-8')
+            vector, version = None, None
+            if op in (self.OP_ADD_VERSIONED, self.OP_DELETE_VERSIONED):
+                op = self.OP_ADD if op == self.OP_ADD_VERSIONED else self.OP_DELETE
+                name, version = name.split('\0', 1)
+            if op == self.OP_ADD:
+                vector = np.frombuffer(data, dtype='<f4', count=dim, offset=name_start + name_len)
+            records.append((op, name, vector, version))
+            offset = end
+
+        if offset < len(data):
+            print(f"Discarding {len(data) - offset} bytes of incomplete template journal")
+            with open(path, 'r+b') as f:
+                f.truncate(offset)
+        return records
+
+    @staticmethod
+    def _replay(names, matrix, versions, lengths,
+                records) -> Tuple[List[str], np.ndarray, List[Optional[str]], List[int]]:
+        """
+        Apply journal records to a snapshot: a row survives unless a later
+        delete names it, either for every version or for the row's version
+        """
+        last_delete = {}
+        for position, (op, name, _, version) in enumerate(records):
+            if op == TemplateStore.OP_DELETE:
+                last_delete[(name, version)] = position
+
+        def deleted_after(name, version, position):
+            latest = last_delete.get((name, None), -2)
+            if version is not None:
+                latest = max(latest, last_delete.get((name, version), -2))
+            return latest > position
+
+        keep = [i for i, (name, version) in enumerate(zip(names, versions)) if not deleted_after(name, version, -1)]
+        blocks = [(matrix[keep], [lengths[i] for i in keep])] if keep else []
+        result_names = [names[i] for i in keep]
+        result_versions = [versions[i] for i in keep]
+        for position, (op, name, vector, version) in enumerate(records):
+            if op == TemplateStore.OP_ADD and not deleted_after(name, version, position):
+                blocks.append((vector[np.newaxis, :], [vector.shape[0]]))
+                result_names.append(name)
+                result_versions.append(version)
+
+        if not blocks:
+            return [], np.empty((0, matrix.shape[1] if matrix.ndim == 2 else 0), dtype=np.float32), [], []
+        result_matrix, result_lengths = TemplateStore.stack_rows(blocks)
+        return result_names, result_matrix, result_versions, result_lengths
+
+    @staticmethod
+    def stack_rows(blocks) -> Tuple[np.ndarray, List[int]]:
+        """
+        Stack (matrix, row lengths) blocks whose rows may differ in length
+        Returns: Tuple (matrix zero-padded to the widest row, row lengths)
+        """
+        blocks = [(block, block_lengths) for block, block_lengths in blocks if block.shape[0]]
+        lengths = [length for _, block_lengths in blocks for length in block_lengths]
+        if not blocks:
+            return np.empty((0, 0), dtype=np.float32), []
+        width = max(lengths)
+        matrix = np.zeros((len(lengths), width), dtype=np.float32)
+        row = 0
+        for block, _ in blocks:
+            columns = min(width, block.shape[1])
+            matrix[row:row + block.shape[0], :columns] = block[:, :columns]
+            row += block.shape[0]
+        return matrix, lengths
+
+    def _write_record(self, op: int, name: str, vector=None, version: Optional[str] = None) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if version is not None:
+            op = self.OP_ADD_VERSIONED if op == self.OP_ADD else self.OP_DELETE_VERSIONED
+            name = f"{name}\0{version}"
+        name_bytes = name.encode('utf-8')
+        payload = b'' if vector is None else np.ascontiguousarray(vector, dtype='<f4').ravel().tobytes()
+        body = self.RECORD_HEADER.pack(op, len(name_bytes), len(payload) // 4) + name_bytes + payload
+        with self.lock:
+            with open(self._journal_path(self.generation), 'ab') as f:
+                f.write(body + self.RECORD_CRC.pack(zlib.crc32(body)))
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_records += 1
+
+    def append(self, name: str, vector, version: Optional[str] = None) -> None:
+        """Journal one new template row for name, optionally tagged with its feature version"""
+        self._write_record(self.OP_ADD, name, vector, version)
+
+    def delete(self, name: str, version: Optional[str] = None) -> None:
+        """Journal the removal of name's template rows of one feature version, or of every version"""
+        self._write_record(self.OP_DELETE, name, version=version)
+
+    def needs_compaction(self, live_rows: int) -> bool:
+        """The journal is worth folding once it is large relative to the gallery"""
+        return (self.journal_records >= self.compact_min_records
+                and self.journal_records >= live_rows * self.compact_ratio)
+
+    def compact(self, snapshot: Callable[[], Tuple], background=False) -> None:
+        """
+        Fold the journal into a new snapshot generation.
+        snapshot is called with the store lock held and must return the
+        current (names, matrix), (names, matrix, versions) or (names,
+        matrix, versions, lengths), i.e. the state the journal describes.
+        """
+        if background:
+            with self.lock:
+                if self._compacting:
+                    return
+                self._compacting = True
+            threading.Thread(target=self._compact_worker, args=(snapshot,), daemon=True).start()
+            return
+
+        with self.lock:
+            self.save(*snapshot())
+
+    def _compact_worker(self, snapshot) -> None:
+        try:
+            self.compact(snapshot)
+        except Exception as e:
+            print(f"Error compacting face templates: {e}")
+        finally:
+            self._compacting = False
+
+    def save(self, names: List[str], matrix, versions: Optional[List[Optional[str]]] = None,
+             lengths: Optional[List[int]] = None) -> None:
+        """
+        Write the names, feature matrix, row versions and row lengths (for a
+        zero-padded matrix) as a new store generation with an empty journal
+        """
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+            generation = self.generation + 1
+            if os.path.exists(self.index_path):
+                try:
+                    generation = max(generation, self._read_index().get('generation', 0) + 1)
+                except (OSError, ValueError):
+                    pass
+            features_file = f"features-{generation:08d}.npy"
+            np.save(os.path.join(self.directory, features_file), matrix)
+
+            index = {
+                'format': self.FORMAT_VERSION,
+                'generation': generation,
+                'dim': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                'features': features_file,
+                'names': list(names),
+            }
+            if versions is not None:
+                index['versions'] = list(versions)
+            if lengths is not None and any(length != index['dim'] for length in lengths):
+                index['lengths'] = [int(length) for length in lengths]
+            temp_path = self.index_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.index_path)
+
+            self.generation = generation
+            self.journal_records = 0
+            self._remove_stale_generations(keep=features_file)
+
+    def _remove_stale_generations(self, keep: str) -> None:
+        """Delete older feature files and journals; ones still mapped elsewhere are left for next time"""
+        for filename in os.listdir(self.directory):
+            stale_features = filename.startswith("features-") and filename.endswith(".npy") and filename != keep
+            stale_journal = filename.startswith("journal-") and filename != os.path.basename(self._journal_path(self.generation))
+            if stale_features or stale_journal:
+                try:
+                    os.remove(os.path.join(self.directory, filename))
+                except OSError:
+                    pass
+
+    def clear(self) -> None:
+        """Remove every file belonging to the store"""
+        if not os.path.isdir(self.directory):
+            return
+        with self.lock:
+            for filename in os.listdir(self.directory):
+                if filename.startswith((self.INDEX_FILE, "features-", "journal-")):
+                    os.remove(os.path.join(self.directory, filename))
+            self.generation = 0
+            self.journal_records = 0
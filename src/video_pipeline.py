@@ -0,0 +1,266 @@
+"""
+Facial Recognition Attendance System - Video Pipeline Module
+Author: Uzman Jawaid
+Description: Decoupled capture, recognition and render stages for live video
+Version: 2.0
+Date: August 2025
+"""
+
+import threading
+import time
+import cv2
+from typing import Callable, List, Optional, Tuple
+
+
+class LatestFrameQueue:
+    """
+    Single-slot hand-off between pipeline stages. put() never blocks and
+    overwrites an item the consumer has not taken yet, so a slow consumer
+    always gets the newest frame instead of falling further behind.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item) -> None:
+        with self._condition:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Wait for the next item; returns None on timeout or once closed"""
+        with self._condition:
+            if self._item is None and not self._closed:
+                self._condition.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class StageCounter:
+    """Frames handled by a stage and its rate over the last reporting window"""
+
+    def __init__(self):
+        self.count = 0
+        self.fps = 0.0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def tick(self) -> None:
+        self.count += 1
+        self._window_count += 1
+        elapsed = time.monotonic() - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._window_count / elapsed
+            self._window_start = time.monotonic()
+            self._window_count = 0
+
+
+class CpuMeter:
+    """Process CPU usage (all threads) between successive samples, as a percentage of one core"""
+
+    def __init__(self):
+        self._cpu = time.process_time()
+        self._wall = time.monotonic()
+
+    def sample(self) -> float:
+        cpu, wall = time.process_time(), time.monotonic()
+        percent = 100.0 * (cpu - self._cpu) / (wall - self._wall) if wall > self._wall else 0.0
+        self._cpu, self._wall = cpu, wall
+        return percent
+
+
+class FrameRateGovernor:
+    """
+    Decides which captured frames are worth recognising.
+
+    Each frame is shrunk to a tiny grayscale probe and compared with the
+    previous one. While the scene is static the governor admits idle_fps
+    frames per second; motion (more than motion_area of the probe changing
+    by over motion_threshold grey levels) or a face reported through
+    observe() switches it to active_fps (None: every frame) until
+    hold_seconds pass without either.
+    """
+
+    def __init__(self, idle_fps: float = 1.0, active_fps: Optional[float] = None,
+                 motion_threshold: int = 15, motion_area: float = 0.005, hold_seconds: float = 3.0,
+                 probe_size: Tuple[int, int] = (64, 48)):
+        self.idle_interval = 1.0 / idle_fps
+        self.active_interval = 1.0 / active_fps if active_fps else 0.0
+        self.motion_threshold = motion_threshold
+        self.motion_area = motion_area
+        self.hold_seconds = hold_seconds
+        self.probe_size = probe_size
+
+        self.admitted = 0
+        self.skipped = 0
+        self._previous = None
+        self._active_until = 0.0
+        self._last_admitted = 0.0
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() < self._active_until
+
+    @property
+    def mode(self) -> str:
+        return "active" if self.active else "idle"
+
+    def _motion(self, frame) -> bool:
+        probe = cv2.resize(frame, self.probe_size, interpolation=cv2.INTER_AREA)
+        if probe.ndim == 3:
+            probe = cv2.cvtColor(probe, cv2.COLOR_BGR2GRAY)
+        previous, self._previous = self._previous, probe
+        if previous is None:
+            return True
+        changed = cv2.countNonZero(cv2.threshold(cv2.absdiff(probe, previous), self.motion_threshold,
+                                                 255, cv2.THRESH_BINARY)[1])
+        return changed > self.motion_area * probe.size
+
+    def admit(self, frame) -> bool:
+        """Whether this frame should be recognised"""
+        now = time.monotonic()
+        if self._motion(frame):
+            self._active_until = now + self.hold_seconds
+        interval = self.active_interval if now < self._active_until else self.idle_interval
+        if now - self._last_admitted < interval:
+            self.skipped += 1
+            return False
+        self._last_admitted = now
+        self.admitted += 1
+        return True
+
+    def observe(self, faces) -> None:
+        """Recognition results for an admitted frame; any face keeps the governor active"""
+        if faces:
+            self._active_until = time.monotonic() + self.hold_seconds
+
+
+class VideoPipeline:
+    """
+    Runs capture, recognition and rendering on separate threads.
+
+    - Capture reads (and mirrors) frames as fast as the camera delivers them
+      and never waits on the other stages.
+    - Recognition takes the newest captured frame, runs the recognizer and
+      hands the results to on_results (attendance marking happens here).
+    - Rendering takes the newest captured frame and passes it to on_render
+      together with the most recent recognition results.
+
+    Stages are connected by LatestFrameQueue slots, so whichever stage is
+    slower simply skips frames. With a FrameRateGovernor the recognition
+    stage also skips frames while nothing moves in front of the camera.
+    The capture source is released when the pipeline stops.
+    """
+
+    def __init__(self, capture, recognizer,
+                 on_results: Optional[Callable] = None,
+                 on_render: Optional[Callable] = None,
+                 mirror: bool = True,
+                 governor: Optional[FrameRateGovernor] = None):
+        self.capture = capture
+        self.recognizer = recognizer
+        self.on_results = on_results
+        self.on_render = on_render
+        self.mirror = mirror
+        self.governor = governor
+
+        self.running = False
+        self.latest_results: List = []
+        self.capture_stats = StageCounter()
+        self.recognition_stats = StageCounter()
+        self.render_stats = StageCounter()
+        self.cpu = CpuMeter()
+
+        self._recognition_queue = LatestFrameQueue()
+        self._render_queue = LatestFrameQueue()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start all stage threads"""
+        self.running = True
+        stages = [self._capture_loop, self._recognition_loop]
+        if self.on_render is not None:
+            stages.append(self._render_loop)
+        for stage in stages:
+            thread = threading.Thread(target=stage, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, wait: bool = False, timeout: float = 2.0) -> None:
+        """
+        Signal every stage to finish. Only wait from a thread that is not
+        needed by on_render (e.g. not the Tk main loop).
+        """
+        self.running = False
+        self._recognition_queue.close()
+        self._render_queue.close()
+        if wait:
+            for thread in self._threads:
+                if thread is not threading.current_thread():
+                    thread.join(timeout)
+
+    def _capture_loop(self) -> None:
+        try:
+            while self.running:
+                ret, frame = self.capture.read()
+                if not ret:
+                    break
+
+                # Flip frame horizontally for mirror effect
+                if self.mirror:
+                    frame = cv2.flip(frame, 1)
+                self.capture_stats.tick()
+
+                self._recognition_queue.put(frame)
+                if self.on_render is not None:
+                    # Rendering draws on its frame, so it gets its own copy
+                    self._render_queue.put(frame.copy())
+        except Exception as e:
+            print(f"Error in capture stage: {e}")
+        finally:
+            self.stop()
+            self.capture.release()
+
+    def _recognition_loop(self) -> None:
+        while self.running:
+            frame = self._recognition_queue.get(timeout=0.5)
+            if frame is None:
+                continue
+            try:
+                if self.governor is not None and not self.governor.admit(frame):
+                    continue
+                results = self.recognizer.recognize_faces_in_frame(frame)
+                self.latest_results = results
+                self.recognition_stats.tick()
+                if self.governor is not None:
+                    self.governor.observe(results)
+                if self.on_results is not None:
+                    self.on_results(frame, results)
+            except Exception as e:
+                print(f"Error in recognition stage: {e}")
+
+    def _render_loop(self) -> None:
+        while self.running:
+            frame = self._render_queue.get(timeout=0.5)
+            if frame is None:
+                continue
+            try:
+                self.on_render(frame, self.latest_results)
+                self.render_stats.tick()
+            except Exception as e:
+                print(f"Error in render stage: {e}")
+
+    @property
+    def dropped_frames(self) -> int:
+        """Frames captured but skipped by the recognition stage"""
+        return self._recognition_queue.dropped
@@ -0,0 +1,67 @@
+"""
+Facial Recognition Attendance System - Batch Recognition Tests
+Author: Uzman Jawaid
+Description: Recognition events must survive the JSON Lines and CSV exports
+Version: 2.0
+Date: August 2025
+"""
+
+import csv
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_recognize import EventWriter
+from src.batch_recognition import RecognitionEvent
+
+
+def make_event():
+    # detect_faces returns numpy integers, not Python ints
+    box = tuple(np.array([165, 402, 330, 237], dtype=np.int32))
+    return RecognitionEvent("entrance.mp4", 12, datetime(2025, 8, 1, 9, 30, 15, 250000),
+                            "Alice", np.float64(0.8731), box)
+
+
+class RecognitionEventExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_as_dict_round_trips_through_json(self):
+        row = json.loads(json.dumps(make_event().as_dict()))
+        self.assertEqual(row['box'], [165, 402, 330, 237])
+        self.assertEqual(row['confidence'], 0.8731)
+        self.assertTrue(row['confirmed'])
+
+    def test_event_writer_jsonl(self):
+        path = os.path.join(self.directory.name, "events.jsonl")
+        writer = EventWriter(path)
+        writer.write(make_event())
+        writer.close()
+        with open(path, encoding='utf-8') as f:
+            row = json.loads(f.readline())
+        self.assertEqual(row['box'], [165, 402, 330, 237])
+        self.assertEqual(row['timestamp'], "2025-08-01 09:30:15.250")
+
+    def test_event_writer_csv(self):
+        path = os.path.join(self.directory.name, "events.csv")
+        writer = EventWriter(path)
+        writer.write(make_event())
+        writer.close()
+        with open(path, newline='', encoding='utf-8') as f:
+            row = next(csv.DictReader(f))
+        self.assertEqual(json.loads(row['box']), [165, 402, 330, 237])
+        self.assertEqual(row['name'], "Alice")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,12 +9,16 @@ Date: August 2025
 import tkinter as tk
 from tkinter import ttk, messagebox
 import cv2
-from PIL import Image, ImageTk
-import threading
 import os
+import queue
 from datetime import datetime, date
 from src.database import Database
-from src.simple_face_recognition import SimpleFaceRecognizer
+from src.simple_face_recognition import SimpleFaceRecognizer, face_size_range
+from src.video_pipeline import FrameRateGovernor, VideoPipeline
+from src.frame_display import TkFrameDisplay
+from src.face_tracker import TrackingRecognizer
+from src.identity_voting import IdentityVoter
+from src.cooldown_cache import ACTIONS_BY_STATUS, CooldownCache
 
 class UserAttendanceApp:
     def __init__(self, root):
@@ -25,14 +29,27 @@ class UserAttendanceApp:
         
         # Initialize components
         self.db = Database()
-        self.face_recognizer = SimpleFaceRecognizer()
+        # Detect at half resolution; face size limits are set once the camera is open
+        self.face_recognizer = SimpleFaceRecognizer(detection_scale=0.5)
         
         # Camera variables
         self.cap = None
         self.camera_running = False
-        self.video_thread = None
+        self.pipeline = None
+        self.tracker = None
+        # A face must be recognised in 2 of its last 3 full recognitions
+        # before attendance is marked, so one noisy frame cannot check anyone in
+        self.recent_actions = CooldownCache(default=15.0)
+        self.voter = IdentityVoter(min_votes=2, window=3, threshold=0.5)
+        
+        # Finished writes are handed from the database writer thread to the
+        # Tk main loop here; the writer never calls Tk itself
+        self.committed_writes = queue.Queue()
         
         self.setup_ui()
+        # Camera frames are pasted into one PhotoImage at up to 30 fps
+        self.display = TkFrameDisplay(self.root, self.camera_label, size=(800, 600), max_fps=30)
+        self.poll_after_id = self.root.after(100, self.poll_committed_writes)
     
     def setup_ui(self):
         """Setup the user interface"""
@@ -98,146 +115,110 @@ class UserAttendanceApp:
             messagebox.showerror("Error", "Could not open camera")
             return
         
+        # Only look for faces of people standing 0.3-2 m from a 60 degree webcam
+        frame_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640
+        self.face_recognizer.min_face_size, self.face_recognizer.max_face_size = \
+            face_size_range(frame_width, 60, 0.3, 2.0)
+        
         self.camera_running = True
         self.start_camera_btn.config(state=tk.DISABLED)
         self.stop_camera_btn.config(state=tk.NORMAL)
         
-        # Start video thread
-        self.video_thread = threading.Thread(target=self.video_loop)
-        self.video_thread.daemon = True
-        self.video_thread.start()
+        # Capture, recognition and rendering each run on their own thread;
+        # faces are tracked between full detections, and recognition drops
+        # to 2 fps while nobody moves in front of the camera
+        self.tracker = TrackingRecognizer(self.face_recognizer)
+        self.voter.reset()
+        self.pipeline = VideoPipeline(self.cap, self.tracker,
+                                      on_results=self.process_recognitions,
+                                      on_render=self.render_frame,
+                                      governor=FrameRateGovernor(idle_fps=2.0))
+        self.pipeline.start()
+        self.display.start()
         
         self.status_var.set("Camera active - Looking for faces...")
     
     def stop_camera(self):
         """Stop the camera"""
         self.camera_running = False
-        if self.cap:
-            self.cap.release()
+        if self.pipeline:
+            # The capture stage releases the camera once it stops
+            self.pipeline.stop()
+            governor = self.pipeline.governor
+            print(f"Camera session: {governor.admitted} frames recognised, {governor.skipped} skipped "
+                  f"while idle, {self.pipeline.cpu.sample():.0f}% CPU")
+        self.display.stop()
         
         self.start_camera_btn.config(state=tk.NORMAL)
         self.stop_camera_btn.config(state=tk.DISABLED)
         self.camera_label.config(image='', text="Camera stopped")
         self.status_var.set("Camera stopped")
     
-    def video_loop(self):
-        """Main video processing loop"""
-        while self.camera_running:
-            ret, frame = self.cap.read()
-            if not ret:
-                break
+    def process_recognitions(self, frame, recognized_faces):
+        """Recognition stage: mark attendance for faces confirmed across frames"""
+        confirmed = self.voter.update(recognized_faces, fresh=self.tracker.last_frame_detected)
+        for name, _, confidence in confirmed:
+            status, _, _ = self.get_employee_status(name)
+            self.mark_attendance_smart(name, status)
+    
+    def render_frame(self, frame, recognized_faces):
+        """Render stage: draw the latest recognitions and show the frame"""
+        # Draw rectangles and names
+        for name, (top, right, bottom, left), confidence in recognized_faces:
+            # Get employee status
+            status, time_in, time_out = None, None, None
+            if name != "Unknown":
+                status, time_in, time_out = self.get_employee_status(name)
             
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
+            # Draw rectangle around face with status colors
+            if name == "Unknown":
+                color = (0, 0, 255)  # Red for unknown
+            elif status == "checked_in":
+                color = (0, 255, 255)  # Yellow for checked in
+            elif status == "checked_out":
+                color = (0, 255, 0)  # Green for checked out
+            else:
+                color = (255, 0, 0)  # Blue for not present today
             
-            # Recognize faces
-            recognized_faces = self.face_recognizer.recognize_faces_in_frame(frame)
+            cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
             
-            # Draw rectangles and names
-            for name, (top, right, bottom, left), confidence in recognized_faces:
-                # Get employee status
-                status, time_in, time_out = None, None, None
-                if name != "Unknown":
-                    status, time_in, time_out = self.get_employee_status(name)
-                
-                # Draw rectangle around face with status colors
-                if name == "Unknown":
-                    color = (0, 0, 255)  # Red for unknown
-                elif status == "checked_in":
-                    color = (0, 255, 255)  # Yellow for checked in
+            # Draw status label
+            if name != "Unknown":
+                if status == "checked_in":
+                    label = f"{name} - CHECKED IN ({time_in})"
                 elif status == "checked_out":
-                    color = (0, 255, 0)  # Green for checked out
-                else:
-                    color = (255, 0, 0)  # Blue for not present today
-                
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                
-                # Draw status label
-                if name != "Unknown":
-                    if status == "checked_in":
-                        label = f"{name} - CHECKED IN ({time_in})"
-                    elif status == "checked_out":
-                        label = f"{name} - CHECKED OUT ({time_out})"
-                    else:
-                        label = f"{name} - Ready to check in"
+                    label = f"{name} - CHECKED OUT ({time_out})"
                 else:
-                    label = "Unknown Person"
-                
-                # Draw label background and text
-                (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-                cv2.rectangle(frame, (left, bottom + 5), (left + label_width + 10, bottom + label_height + 15), color, cv2.FILLED)
-                cv2.putText(frame, label, (left + 5, bottom + label_height + 10), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-                
-                # Mark attendance for known faces with high confidence
-                if name != "Unknown" and confidence > 0.5:  # Lowered threshold for better detection
-                    self.mark_attendance_smart(name, status)
+                    label = f"{name} - Ready to check in"
+            else:
+                label = "Unknown Person"
             
-            # Convert frame to PIL format for tkinter
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            frame_pil = Image.fromarray(frame_rgb)
-            frame_pil = frame_pil.resize((800, 600), Image.Resampling.LANCZOS)
-            frame_tk = ImageTk.PhotoImage(frame_pil)
-            
-            # Update the label
-            self.camera_label.config(image=frame_tk, text='')
-            self.camera_label.image = frame_tk
+            # Draw label background and text
+            (label_width, label_height), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+            cv2.rectangle(frame, (left, bottom + 5), (left + label_width + 10, bottom + label_height + 15), color, cv2.FILLED)
+            cv2.putText(frame, label, (left + 5, bottom + label_height + 10), 
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
-        # Cleanup when loop ends
-        if self.cap:
-            self.cap.release()
+        # Resized into reused buffers here, shown by the Tk main loop
+        self.display.show(frame)
     
     def mark_attendance_smart(self, name, current_status):
         """Smart attendance marking with alerts"""
-        # Simple throttling mechanism
-        current_time = datetime.now()
-        
-        if hasattr(self, '_last_recognition'):
-            if name in self._last_recognition:
-                time_diff = (current_time - self._last_recognition[name]).total_seconds()
-                if time_diff < 15:  # 15 second cooldown to prevent spam
-                    return
-        else:
-            self._last_recognition = {}
-        
-        self._last_recognition[name] = current_time
+        # 15 second cooldown per person to prevent spam
+        action = ACTIONS_BY_STATUS.get(current_status)
+        if not self.recent_actions.allow(name, action):
+            return
         
         try:
             if current_status == "not_present":
-                # User detected - Mark as present with alert
-                success = self.db.mark_attendance(name)
-                if success:
-                    # Show success alert
-                    self.root.after(0, lambda: self.show_attendance_alert(
-                        "✅ CHECK-IN SUCCESSFUL", 
-                        f"Welcome {name}!\nTime IN marked successfully.\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
-                    ))
-                    self.root.after(0, lambda: self.status_var.set(f"✅ {name} CHECKED IN at {datetime.now().strftime('%H:%M:%S')}"))
-                    self.root.after(0, self.refresh_status)
-                else:
-                    # Show error alert
-                    self.root.after(0, lambda: self.show_attendance_alert(
-                        "❌ CHECK-IN FAILED", 
-                        f"Failed to mark attendance for {name}.\nPlease try again or use manual check-in."
-                    ))
+                # User detected - queue time-in; the alert is shown once it commits
+                future = self.db.submit_attendance(name)
+                future.add_done_callback(lambda f: self.committed_writes.put((self.on_check_in_committed, name, f)))
                     
             elif current_status == "checked_in":
-                # User is already present - Mark timeout with alert
-                success = self.db.mark_time_out(name)
-                if success:
-                    # Show timeout success alert
-                    self.root.after(0, lambda: self.show_attendance_alert(
-                        "🏠 TIME-OUT SUCCESSFUL", 
-                        f"Goodbye {name}!\nTime OUT marked successfully.\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
-                    ))
-                    self.root.after(0, lambda: self.status_var.set(f"🏠 {name} TIMED OUT at {datetime.now().strftime('%H:%M:%S')}"))
-                    self.root.after(0, self.refresh_status)
-                else:
-                    # Show timeout error alert
-                    self.root.after(0, lambda: self.show_attendance_alert(
-                        "❌ TIME-OUT FAILED", 
-                        f"Failed to mark time-out for {name}.\nPlease try again or use manual time-out."
-                    ))
+                # User is already present - queue time-out
+                future = self.db.submit_time_out(name)
+                future.add_done_callback(lambda f: self.committed_writes.put((self.on_time_out_committed, name, f)))
                     
             elif current_status == "checked_out":
                 # User already timed out today
@@ -248,12 +229,64 @@ class UserAttendanceApp:
                 self.root.after(0, lambda: self.status_var.set(f"ℹ️ {name} already completed attendance for today"))
                 
         except Exception as e:
-            print(f"Error in attendance marking: {e}")
-            # Show general error alert
-            self.root.after(0, lambda: self.show_attendance_alert(
-                "❌ SYSTEM ERROR", 
-                f"An error occurred while processing\nattendance for {name}.\n\nError: {str(e)}"
-            ))
+            self.show_system_error(name, e)
+    
+    def poll_committed_writes(self):
+        """Handle attendance writes the database writer has finished; runs on the Tk main loop"""
+        self.poll_after_id = self.root.after(100, self.poll_committed_writes)
+        try:
+            while True:
+                handler, name, future = self.committed_writes.get_nowait()
+                handler(name, future)
+        except queue.Empty:
+            pass
+    
+    def on_check_in_committed(self, name, future):
+        """Alert the user once a queued time-in has been written"""
+        if future.exception() is not None:
+            self.show_system_error(name, future.exception())
+        elif future.result():
+            # Show success alert
+            self.show_attendance_alert(
+                "✅ CHECK-IN SUCCESSFUL", 
+                f"Welcome {name}!\nTime IN marked successfully.\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
+            )
+            self.status_var.set(f"✅ {name} CHECKED IN at {datetime.now().strftime('%H:%M:%S')}")
+            self.refresh_status()
+        else:
+            # Show error alert
+            self.show_attendance_alert(
+                "❌ CHECK-IN FAILED", 
+                f"Failed to mark attendance for {name}.\nPlease try again or use manual check-in."
+            )
+    
+    def on_time_out_committed(self, name, future):
+        """Alert the user once a queued time-out has been written"""
+        if future.exception() is not None:
+            self.show_system_error(name, future.exception())
+        elif future.result():
+            # Show timeout success alert
+            self.show_attendance_alert(
+                "🏠 TIME-OUT SUCCESSFUL", 
+                f"Goodbye {name}!\nTime OUT marked successfully.\n\nTime: {datetime.now().strftime('%H:%M:%S')}"
+            )
+            self.status_var.set(f"🏠 {name} TIMED OUT at {datetime.now().strftime('%H:%M:%S')}")
+            self.refresh_status()
+        else:
+            # Show timeout error alert
+            self.show_attendance_alert(
+                "❌ TIME-OUT FAILED", 
+                f"Failed to mark time-out for {name}.\nPlease try again or use manual time-out."
+            )
+    
+    def show_system_error(self, name, error):
+        """Report an unexpected attendance error"""
+        print(f"Error in attendance marking: {error}")
+        # Show general error alert
+        self.root.after(0, lambda: self.show_attendance_alert(
+            "❌ SYSTEM ERROR", 
+            f"An error occurred while processing\nattendance for {name}.\n\nError: {str(error)}"
+        ))
     
     def get_employee_status(self, name):
         """Get current status of an employee"""
@@ -373,6 +406,9 @@ class UserAttendanceApp:
         """Handle application closing"""
         if self.camera_running:
             self.stop_camera()
+        self.root.after_cancel(self.poll_after_id)
+        # Commits any queued attendance writes before closing
+        self.db.close()
         self.root.destroy()
 
 def main():